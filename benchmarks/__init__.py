@@ -0,0 +1,10 @@
+"""Benchmarks for naucse_render
+
+These are not part of the installed package. Run them from the repository
+root, for example:
+
+    python -m benchmarks.markdown_convert
+
+`benchmarks.suite` times the main entrypoints on a generated repository,
+and can compare the results with a saved baseline (see its docstring).
+"""
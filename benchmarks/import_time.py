@@ -0,0 +1,58 @@
+"""Start-up cost: time to import naucse_render, and the slowest imports
+
+Tools like Arca run naucse_render as a subprocess many times, so import
+time adds up. This runs `python -X importtime` in a new process (several
+times, reporting the best), and lists the modules that took the longest
+to import, including everything they imported.
+
+    python -m benchmarks.import_time [MODULE]
+
+`benchmarks.suite` includes the import time of `naucse_render.cli`
+in its results, so it can be compared with a baseline.
+"""
+
+import subprocess
+import sys
+
+DEFAULT_MODULE = 'naucse_render.cli'
+
+
+def measure_import(module=DEFAULT_MODULE):
+    """Import `module` in a new process
+
+    Return a dict of {module name: cumulative import time in seconds},
+    for all modules that were imported.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        encoding='utf-8',
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:'):
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip() == 'cumulative':
+            continue
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def best_import_time(module=DEFAULT_MODULE, repeat=5):
+    """Return the best time (in seconds) of importing `module`"""
+    return min(measure_import(module)[module] for i in range(repeat))
+
+
+def main(module=DEFAULT_MODULE, repeat=5, top=20):
+    runs = [measure_import(module) for i in range(repeat)]
+    times = min(runs, key=lambda times: times[module])
+    print(f'import {module}: {times[module] * 1000:.1f} ms (best of {repeat})')
+    print(f'{len(times)} modules imported; slowest (including submodules):')
+    for name, seconds in sorted(times.items(), key=lambda i: -i[1])[:top]:
+        print(f'  {seconds * 1000:>8.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,115 @@
+"""Cost of Jinja template loading for lessons that share a layout
+
+Generates a course whose lesson pages all extend a common layout
+(which includes a few partials), and renders all of its pages:
+
+- with a new Jinja environment for each page, as naucse_render used to do,
+- with the shared environment,
+- with a fresh environment but a warm bytecode cache, as in a new
+  `compile` run with `--cache-dir`.
+"""
+
+from pathlib import Path
+import tempfile
+import time
+
+import yaml
+
+from naucse_render.page import render_page, get_lessons_environment
+from naucse_render.cache import RenderCache
+
+LAYOUT = '''
+{% include 'shared/layout/_header.md' %}
+
+{% block content %}{% endblock %}
+
+{% for i in range(20) %}
+{% if i is even %}* item {{ i }} {{ gnd('m', 'f') }}{% endif %}
+{% endfor %}
+
+{% include 'shared/layout/_footer.md' %}
+'''
+
+PAGE = '''{% extends 'shared/layout/_layout.md' %}
+{% block content %}
+Lesson {{ lesson.slug }}, page PAGE_NUMBER.
+{% endblock %}
+'''
+
+
+def generate(path, n_lessons, n_pages):
+    layout_path = path / 'lessons/shared/layout'
+    layout_path.mkdir(parents=True)
+    (layout_path / '_layout.md').write_text(LAYOUT)
+    (layout_path / '_header.md').write_text('# Header\n' * 20)
+    (layout_path / '_footer.md').write_text('Footer *text*\n' * 20)
+    pages = []
+    for i in range(n_lessons):
+        lesson_path = path / 'lessons/bench' / f'lesson{i}'
+        lesson_path.mkdir(parents=True)
+        info = {
+            'title': f'Lesson {i}', 'style': 'md',
+            'attribution': 'Benchmark', 'license': 'cc0',
+        }
+        (lesson_path / 'info.yml').write_text(yaml.safe_dump(info))
+        for j in range(n_pages):
+            (lesson_path / f'page{j}.md').write_text(PAGE.replace('PAGE_NUMBER', str(j)))
+            pages.append((f'bench/lesson{i}', f'page{j}', {**info, 'title': 't'}))
+    return pages
+
+
+def render_all(path, pages, *, shared, cache=None):
+    start = time.perf_counter()
+    for lesson_slug, page_slug, info in pages:
+        if not shared:
+            get_lessons_environment.cache_clear()
+        render_page(lesson_slug, page_slug, info, path, cache=cache)
+    return time.perf_counter() - start
+
+
+class _BytecodeOnlyCache(RenderCache):
+    """RenderCache that only caches compiled templates, not whole pages"""
+    def get(self, key, base_path, *, dependencies=None):
+        return None
+
+    def set(self, key, page, dependencies, base_path):
+        pass
+
+    def get_highlighted(self, lang, code):
+        return None
+
+    def set_highlighted(self, lang, code, html):
+        pass
+
+
+def main(n_lessons=50, n_pages=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp).resolve()
+        pages = generate(path, n_lessons, n_pages)
+        cache = _BytecodeOnlyCache(path / 'cache')
+
+        per_page = render_all(path, pages, shared=False)
+        shared = render_all(path, pages, shared=True)
+
+        # Warm up the bytecode cache, then simulate a new run
+        render_all(path, pages, shared=True, cache=cache)
+        get_lessons_environment.cache_clear()
+        start = time.perf_counter()
+        render_all(path, pages[:1], shared=True, cache=cache)
+        first_page_bytecode = time.perf_counter() - start
+        get_lessons_environment.cache_clear()
+        start = time.perf_counter()
+        render_all(path, pages[:1], shared=True)
+        first_page_cold = time.perf_counter() - start
+
+    n = len(pages)
+    print(f'{n} pages extending a common layout:')
+    print(f'  environment per page: {per_page * 1000:8.1f} ms')
+    print(f'  shared environment:   {shared * 1000:8.1f} ms')
+    print(f'First page in a new run:')
+    print(f'  no bytecode cache:    {first_page_cold * 1000:8.1f} ms')
+    print(f'  warm bytecode cache:  {first_page_bytecode * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Per-call cost of convert_markdown
+
+Compares the current convert_markdown (which reuses pooled parsers) with
+creating a new mistune parser for each call, as naucse_render used to do.
+"""
+
+import timeit
+
+import mistune
+
+from naucse_render.markdown import (
+    convert_markdown, NaucseRenderer, naucse_admonition_plugin,
+)
+
+SNIPPETS = {
+    'attribution': 'Pro PyLadies Brno napsal Petr Viktorin, 2014-2019',
+    'description': 'Úvod do *Pythonu*: [instalace](../install/) a `print`.',
+    'page': '''
+# Heading
+
+Some text with a [link](../../beginners/install/) and *emphasis*.
+
+> [note] Note
+> This is an admonition.
+
+Term
+: Definition
+
+* item 1
+* item 2
+''',
+}
+
+
+def convert_markdown_fresh_parser(text, convert_url=None, *, inline=False):
+    """convert_markdown as it was before parsers were reused"""
+    convert_url = convert_url if convert_url else lambda x: x
+    markdown = mistune.create_markdown(
+        plugins=['def_list', naucse_admonition_plugin],
+        renderer=NaucseRenderer(convert_url),
+    )
+    return markdown(text).strip()
+
+
+def bench(func, text, number):
+    timer = timeit.Timer(lambda: func(text))
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def main(number=2000):
+    print(f'{"snippet":<12} {"fresh parser":>14} {"reused parser":>14} {"speedup":>8}')
+    for name, text in SNIPPETS.items():
+        assert convert_markdown(text) == convert_markdown_fresh_parser(text)
+        before = bench(convert_markdown_fresh_parser, text, number)
+        after = bench(convert_markdown, text, number)
+        print(
+            f'{name:<12} {before * 1e6:>11.1f} µs {after * 1e6:>11.1f} µs'
+            + f' {before / after:>7.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
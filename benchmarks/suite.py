@@ -0,0 +1,209 @@
+"""Timing of the main entrypoints on a synthetic repository
+
+Times importing `naucse_render.cli` in a new process (see
+`benchmarks.import_time`), then generates a repository (see
+`benchmarks.synthetic`) and times `get_course_slugs`, `get_course`
+(for all courses), `get_lessons` (for all lessons) and `compile_many`
+(for all courses).
+In-memory caches (YAML, Jinja environments, highlighted code, lexers,
+Markdown converters, the notebook exporter) are cleared before each
+measurement; the best of several runs is reported.
+
+Results can be saved as a JSON baseline, and compared with a later run:
+
+    python -m benchmarks.suite run --output baseline.json
+    (make some changes)
+    python -m benchmarks.suite run --output current.json
+    python -m benchmarks.suite compare baseline.json current.json
+
+`compare` exits with an error if any entrypoint got slower than the
+baseline by more than the threshold.
+"""
+
+import json
+from pathlib import Path
+import platform
+import sys
+import tempfile
+import time
+
+import click
+
+import naucse_render
+from naucse_render.compile import get_lesson_slugs
+from naucse_render.instrument import add_listener, remove_listener
+from naucse_render.instrument import print_progress
+from naucse_render.load import yaml_cache
+from naucse_render import markdown, notebook
+from naucse_render.page import get_lessons_environment
+
+from benchmarks.synthetic import generate, DEFAULTS
+from benchmarks.import_time import best_import_time
+
+FORMAT_VERSION = 1
+
+
+def clear_caches():
+    """Clear all in-memory caches, so each measurement starts cold"""
+    yaml_cache.clear()
+    get_lessons_environment.cache_clear()
+    markdown.highlight_code.cache_clear()
+    markdown.get_lexer_by_name.cache_clear()
+    markdown.get_pygments_formatter.cache_clear()
+    markdown.get_ansi_convertor.cache_clear()
+    markdown._converter_pool.clear()
+    notebook.get_exporter.cache_clear()
+
+
+def best_time(func, repeat):
+    times = []
+    for i in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_benchmarks(path, *, repeat=3, jobs=1):
+    """Time the entrypoints on the repository at `path`
+
+    Return a dict of {name: seconds}.
+    """
+    course_slugs = naucse_render.get_course_slugs(path=path)
+    lesson_slugs = set()
+    for slug in course_slugs:
+        course = naucse_render.get_course(slug, path=path)
+        lesson_slugs.update(get_lesson_slugs(course['course']))
+    lesson_slugs = sorted(lesson_slugs)
+
+    def get_courses():
+        for slug in course_slugs:
+            naucse_render.get_course(slug, path=path)
+
+    def compile_all():
+        with tempfile.TemporaryDirectory() as tmp:
+            destinations = {slug: Path(tmp) / slug for slug in course_slugs}
+            naucse_render.compile_many(destinations, path=path, jobs=jobs)
+
+    return {
+        'import': best_import_time(repeat=repeat),
+        'get_course_slugs': best_time(
+            lambda: naucse_render.get_course_slugs(path=path), repeat,
+        ),
+        'get_course': best_time(get_courses, repeat),
+        'get_lessons': best_time(
+            lambda: naucse_render.get_lessons(
+                lesson_slugs, path=path, jobs=jobs,
+            ),
+            repeat,
+        ),
+        'compile': best_time(compile_all, repeat),
+    }
+
+
+def compare_results(baseline, current, threshold):
+    """Compare two result dicts (as saved by `run`)
+
+    Return a list of (name, baseline_time, current_time, regressed) tuples,
+    where `regressed` is true if the current time is worse than
+    the baseline by more than `threshold` (a fraction, e.g. 0.1 for 10%).
+    """
+    rows = []
+    for name, base_time in baseline['results'].items():
+        if name not in current['results']:
+            continue
+        current_time = current['results'][name]
+        regressed = current_time > base_time * (1 + threshold)
+        rows.append((name, base_time, current_time, regressed))
+    return rows
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command()
+@click.option(
+    '--output', '-o', type=Path, default=None,
+    help='Save the results as JSON to this file')
+@click.option(
+    '--repeat', default=3, show_default=True,
+    help='Number of measurements of each entrypoint (the best is used)')
+@click.option(
+    '--jobs', default=1, show_default=True,
+    help='Number of processes for rendering lessons')
+@click.option(
+    '--path', type=Path, default=None,
+    help='Generate the repository in this (new or empty) directory and '
+    + 'keep it, rather than use a temporary one')
+@click.option(
+    '--param', '-p', 'param_list', multiple=True, metavar='NAME=VALUE',
+    help='Repository parameter, e.g. lessons=50. Can be repeated. '
+    + 'Available: '
+    + ', '.join(f'{name} (default {value})' for name, value in DEFAULTS.items()))
+def run(output, repeat, jobs, path, param_list):
+    """Generate a synthetic repository and time the entrypoints"""
+    params = dict(DEFAULTS)
+    for item in param_list:
+        name, sep, value = item.partition('=')
+        if not sep or name not in DEFAULTS:
+            raise click.BadParameter(item, param_hint='--param')
+        params[name] = int(value)
+
+    remove_listener(print_progress)
+    with tempfile.TemporaryDirectory() as tmp:
+        if path is None:
+            path = Path(tmp)
+        path.mkdir(parents=True, exist_ok=True)
+        generate(path, **params)
+        results = run_benchmarks(path.resolve(), repeat=repeat, jobs=jobs)
+    add_listener(print_progress)
+
+    for name, seconds in results.items():
+        print(f'{name:<20} {seconds * 1000:>10.1f} ms')
+    if output:
+        data = {
+            'format_version': FORMAT_VERSION,
+            'params': params,
+            'jobs': jobs,
+            'python': platform.python_version(),
+            'results': results,
+        }
+        with output.open('w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+
+
+@main.command()
+@click.argument('baseline', type=Path)
+@click.argument('current', type=Path)
+@click.option(
+    '--threshold', default=0.1, show_default=True,
+    help='Allowed slowdown, as a fraction of the baseline time')
+def compare(baseline, current, threshold):
+    """Compare results saved by `run`; fail if CURRENT is slower"""
+    baseline = json.loads(baseline.read_text(encoding='utf-8'))
+    current = json.loads(current.read_text(encoding='utf-8'))
+    for key in 'params', 'jobs':
+        if baseline[key] != current[key]:
+            print(
+                f'Warning: {key} differ: {baseline[key]} vs. {current[key]}',
+                file=sys.stderr,
+            )
+
+    rows = compare_results(baseline, current, threshold)
+    print(f'{"":<20} {"baseline":>10} {"current":>10} {"change":>8}')
+    for name, base_time, current_time, regressed in rows:
+        change = current_time / base_time - 1
+        print(
+            f'{name:<20} {base_time * 1000:>7.1f} ms {current_time * 1000:>7.1f} ms'
+            + f' {change:>+8.1%}'
+            + ('  REGRESSION' if regressed else '')
+        )
+    if any(regressed for *_, regressed in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""Generator of synthetic naucse repositories
+
+The generated repository has:
+
+- `lessons` Markdown lessons (`lessons/bench/lessonN`), each with `pages`
+  pages (the index and subpages), `code_blocks` highlighted code blocks and
+  one solution per page, and `static_files` static files of `static_size`
+  bytes,
+- `notebooks` Jupyter Notebook lessons (`lessons/bench/notebookN`),
+- `courses` self-study courses (`courses/courseN`), which all use all
+  the lessons, split into sessions,
+- `runs` runs (`runs/2000/runN`), which derive from the courses (see
+  `derives` in course info) and so share their lessons.
+
+Content is generated from a seeded random generator, so the same
+parameters give the same repository.
+"""
+
+import json
+from pathlib import Path
+import random
+
+import yaml
+
+DEFAULTS = {
+    'lessons': 20,
+    'pages': 3,
+    'code_blocks': 5,
+    'notebooks': 2,
+    'static_files': 2,
+    'static_size': 10_000,
+    'courses': 2,
+    'runs': 10,
+    'seed': 0,
+}
+
+LESSONS_PER_SESSION = 3
+
+WORDS = '''
+    python program variable function loop list string number print
+    editor file terminal error value condition module class object
+'''.split()
+
+CODE = '''\
+def {name}(values):
+    """Return the sum of squares of even values"""
+    total = 0
+    for value in values:
+        if value % 2 == 0:
+            total += value ** {power}
+    return total
+
+print({name}(range({count})))
+'''
+
+
+def generate(path, **params):
+    """Generate a repository in `path` (a new or empty directory)
+
+    Parameters are those listed in `DEFAULTS`.
+    Return a dict of {'course_slugs': ..., 'lesson_slugs': ...}.
+    """
+    params = {**DEFAULTS, **params}
+    unknown = set(params) - set(DEFAULTS)
+    if unknown:
+        raise TypeError(f'Unknown parameters: {", ".join(sorted(unknown))}')
+    path = Path(path)
+    rng = random.Random(params['seed'])
+
+    lesson_slugs = []
+    for i in range(params['lessons']):
+        slug = f'bench/lesson{i}'
+        generate_lesson(path / 'lessons' / slug, i, rng, params)
+        lesson_slugs.append(slug)
+    for i in range(params['notebooks']):
+        slug = f'bench/notebook{i}'
+        generate_notebook_lesson(path / 'lessons' / slug, i, rng, params)
+        lesson_slugs.append(slug)
+
+    sessions = []
+    for start in range(0, len(lesson_slugs), LESSONS_PER_SESSION):
+        number = len(sessions)
+        sessions.append({
+            'title': f'Session {number}',
+            'slug': f'session{number}',
+            'description': f'Session *{number}*: {sentence(rng)}',
+            'materials': [
+                {'lesson': slug}
+                for slug in lesson_slugs[start:start + LESSONS_PER_SESSION]
+            ],
+        })
+
+    course_slugs = []
+    for i in range(params['courses']):
+        write_yaml(path / 'courses' / f'course{i}' / 'info.yml', {
+            'title': f'Course {i}',
+            'description': sentence(rng),
+            'long_description': paragraph(rng),
+            'plan': sessions,
+        })
+        course_slugs.append(f'courses/course{i}')
+    for i in range(params['runs']):
+        if not params['courses']:
+            raise ValueError('Runs derive from courses; need at least one')
+        write_yaml(path / 'runs' / '2000' / f'run{i}' / 'info.yml', {
+            'title': f'Run {i}',
+            'derives': f'course{i % params["courses"]}',
+            'default_time': {'start': '18:00', 'end': '20:00'},
+            'plan': [
+                {
+                    'base': session['slug'],
+                    'date': f'2000-{1 + n // 28 % 12:02}-{1 + n % 28:02}',
+                }
+                for n, session in enumerate(sessions)
+            ],
+        })
+        course_slugs.append(f'2000/run{i}')
+
+    return {'course_slugs': course_slugs, 'lesson_slugs': lesson_slugs}
+
+
+def generate_lesson(path, number, rng, params):
+    info = {
+        'title': f'Lesson {number}',
+        'style': 'md',
+        'attribution': 'Generated for benchmarks',
+        'license': 'cc0',
+    }
+    page_slugs = ['index'] + [f'page{i}' for i in range(1, params['pages'])]
+    if len(page_slugs) > 1:
+        info['subpages'] = {
+            slug: {'title': f'Page {slug}'} for slug in page_slugs[1:]
+        }
+    write_yaml(path / 'info.yml', info)
+    static_names = [f'file{i}.bin' for i in range(params['static_files'])]
+    for name in static_names:
+        static_path = path / 'static' / name
+        static_path.parent.mkdir(parents=True, exist_ok=True)
+        static_path.write_bytes(random_bytes(rng, params['static_size']))
+    for slug in page_slugs:
+        (path / f'{slug}.md').write_text(
+            markdown_page(rng, params['code_blocks'], static_names),
+            encoding='utf-8',
+        )
+
+
+def markdown_page(rng, code_blocks, static_names):
+    parts = [f'# {sentence(rng)}', paragraph(rng)]
+    for i in range(code_blocks):
+        parts.append(f'## {sentence(rng)}')
+        parts.append(paragraph(rng))
+        parts.append('```python\n' + code(rng, i) + '```')
+    for name in static_names:
+        parts.append(f'[Download {name}](static/{name})')
+    parts.append('See [the Python website](https://www.python.org/).')
+    parts.append('{% filter solution %}')
+    parts.append('```python\n' + code(rng, 'solution') + '```')
+    parts.append('{% endfilter %}')
+    return '\n\n'.join(parts) + '\n'
+
+
+def generate_notebook_lesson(path, number, rng, params):
+    write_yaml(path / 'info.yml', {
+        'title': f'Notebook {number}',
+        'style': 'ipynb',
+        'attribution': 'Generated for benchmarks',
+        'license': 'cc0',
+    })
+    cells = []
+    for i in range(max(params['code_blocks'], 1)):
+        cells.append({
+            'cell_type': 'markdown',
+            'metadata': {},
+            'source': [f'## {sentence(rng)}\n', '\n', paragraph(rng)],
+        })
+        cells.append({
+            'cell_type': 'code',
+            'execution_count': i + 1,
+            'metadata': {},
+            'outputs': [{
+                'name': 'stdout',
+                'output_type': 'stream',
+                'text': [f'{rng.randrange(1000)}\n'],
+            }],
+            'source': code(rng, i).splitlines(keepends=True),
+        })
+    notebook = {
+        'cells': cells,
+        'metadata': {
+            'kernelspec': {
+                'display_name': 'Python 3',
+                'language': 'python',
+                'name': 'python3',
+            },
+            'language_info': {'name': 'python', 'version': '3.8.0'},
+        },
+        'nbformat': 4,
+        'nbformat_minor': 2,
+    }
+    (path / 'index.ipynb').write_text(json.dumps(notebook, indent=1))
+
+
+def sentence(rng, words=6):
+    return ' '.join(rng.choice(WORDS) for i in range(words)).capitalize()
+
+
+def paragraph(rng, sentences=5):
+    return ' '.join(sentence(rng) + '.' for i in range(sentences))
+
+
+def code(rng, name):
+    return CODE.format(
+        name=f'func_{name}',
+        power=rng.randrange(2, 5),
+        count=rng.randrange(10, 100),
+    )
+
+
+def random_bytes(rng, size):
+    # (Random.randbytes is only available in Python 3.9+)
+    if not size:
+        return b''
+    return rng.getrandbits(size * 8).to_bytes(size, 'little')
+
+
+def write_yaml(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w', encoding='utf-8') as f:
+        yaml.safe_dump(data, f, sort_keys=False)
@@ -0,0 +1,64 @@
+"""YAML parsing speed: libyaml-based vs. pure-Python loader
+
+Each YAML file from the test fixtures is scaled up by repeating its
+content under many keys, then parsed with both loaders.
+"""
+
+from pathlib import Path
+import time
+
+import yaml
+
+from naucse_render.load import YamlLoader, PyYamlLoader
+
+FIXTURE_PATH = Path(__file__).parent.parent / 'test_naucse_render/fixtures'
+
+
+def scale_up(text, copies):
+    """Return a YAML document containing `text` under `copies` keys"""
+    indented = ''.join('    ' + line for line in text.splitlines(True))
+    return ''.join(f'copy{i}:\n{indented}\n' for i in range(copies))
+
+
+def bench(text, loader, number=3):
+    best = None
+    for i in range(number):
+        start = time.perf_counter()
+        yaml.load(text, Loader=loader)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main(copies=200):
+    if YamlLoader is PyYamlLoader:
+        print('libyaml is not available; nothing to compare')
+        return
+    print(f'{"file (x" + str(copies) + ")":<50} {"pure":>9} {"libyaml":>9} {"speedup":>8}')
+    totals = [0, 0]
+    for path in sorted((FIXTURE_PATH / 'test_content').glob('**/*.yml')):
+        text = scale_up(path.read_text(encoding='utf-8'), copies)
+        try:
+            expected = yaml.load(text, Loader=PyYamlLoader)
+        except yaml.YAMLError:
+            continue
+        assert yaml.load(text, Loader=YamlLoader) == expected
+        pure = bench(text, PyYamlLoader)
+        fast = bench(text, YamlLoader)
+        totals[0] += pure
+        totals[1] += fast
+        name = str(path.relative_to(FIXTURE_PATH / 'test_content'))
+        print(
+            f'{name:<50} {pure * 1000:>6.1f} ms {fast * 1000:>6.1f} ms'
+            + f' {pure / fast:>7.1f}x'
+        )
+    pure, fast = totals
+    print(
+        f'{"total":<50} {pure * 1000:>6.1f} ms {fast * 1000:>6.1f} ms'
+        + f' {pure / fast:>7.1f}x'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,33 @@
+import importlib
+
 from .course import get_course, get_course_slugs
-from .lesson import get_lessons
-from .compile import compile
+from .lesson import get_lessons, iter_lessons
+from .compile import compile, compile_many, check_links
+
+# LazyLesson is imported on first use: it needs the modules for rendering
+# pages (like Jinja), which e.g. listing courses doesn't.
+_LAZY_ATTRIBUTES = {
+    'LazyLesson': 'lazy',
+}
+
+__all__ = [
+    'get_course', 'get_course_slugs', 'get_lessons', 'iter_lessons',
+    'compile', 'compile_many', 'check_links', 'LazyLesson',
+]
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(
+            f'module {__name__!r} has no attribute {name!r}'
+        ) from None
+    module = importlib.import_module(f'.{module_name}', __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_LAZY_ATTRIBUTES})
@@ -0,0 +1,271 @@
+"""
+Persistent cache of rendered pages
+
+Rendering a page (Jinja, Markdown, syntax highlighting, notebooks) is the
+most expensive part of compiling a course. When a directory is given as
+`cache_dir`, results of `render_page` are stored there and reused
+if nothing they depend on changed.
+Highlighted code blocks are also stored, so that blocks shared by
+several pages are only highlighted once.
+"""
+
+from pathlib import Path
+from collections.abc import Mapping
+import hashlib
+import json
+import os
+import tempfile
+
+
+# Distributions whose version affects rendered output
+VERSIONED_DISTRIBUTIONS = (
+    'naucse_render', 'mistune', 'Pygments', 'nbconvert', 'Jinja2',
+)
+
+
+# Recorded instead of a hash for dependencies that don't exist
+MISSING = None
+
+
+def get_versions():
+    """Return versions of naucse_render and the libraries it renders with
+
+    Version numbers don't change during development (or are missing when
+    running from a checkout), so a hash of naucse_render's own source
+    is included as well.
+    """
+    from importlib import metadata  # (slow to import; only needed here)
+    versions = {}
+    for name in VERSIONED_DISTRIBUTIONS:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            # Not installed as a distribution (e.g. running from a checkout)
+            versions[name] = None
+    versions['naucse_render source'] = get_source_hash()
+    return versions
+
+
+def get_source_hash():
+    """Return a hash of the Python sources of the naucse_render package"""
+    package_path = Path(__file__).parent
+    digest = hashlib.sha256()
+    for path in sorted(package_path.glob('*.py')):
+        digest.update(path.name.encode('utf-8') + b'\0')
+        digest.update(hash_file(path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def _json_default(value):
+    # Read-only mappings from YAML (see load.freeze); str for anything else
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_or_missing(path):
+    """Return `hash_file(path)`, or `MISSING` if the file doesn't exist"""
+    try:
+        return hash_file(path)
+    except FileNotFoundError:
+        return MISSING
+
+
+class RenderCache:
+    """Directory with cached results of `render_page`
+
+    Each entry is looked up by a key computed from the lesson & page slug,
+    the page info (from `info.yml`), the merged vars, and the versions of
+    naucse_render and its rendering libraries.
+
+    An entry also records the hashes of all files the render read:
+    the page source, every Jinja template it extended or included,
+    and its `data` YAML. The entry is only used if all of them are unchanged.
+    Templates that were looked for but not found (e.g. with
+    `{% include ... ignore missing %}`) are recorded as missing;
+    the entry is not used if any of them appears.
+    """
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._versions = None
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {str(self.directory)!r}>'
+
+    # Caches are equal if they use the same directory. (Highlighted code is
+    # memoized in memory by cache; instances sent to worker processes
+    # shouldn't each get their own entries.)
+
+    def __eq__(self, other):
+        if not isinstance(other, RenderCache):
+            return NotImplemented
+        return self.directory == other.directory
+
+    def __hash__(self):
+        return hash(self.directory)
+
+    @property
+    def versions(self):
+        if self._versions is None:
+            self._versions = get_versions()
+        return self._versions
+
+    def key(self, lesson_slug, page_slug, info, vars):
+        """Return the cache key for the given page"""
+        return self._hash({
+            'versions': self.versions,
+            'lesson': lesson_slug,
+            'page': page_slug,
+            'info': info,
+            'vars': vars,
+        })
+
+    def _hash(self, data):
+        dumped = json.dumps(
+            data, sort_keys=True, ensure_ascii=False, default=_json_default,
+        )
+        return hashlib.sha256(dumped.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return self.directory / 'pages' / key[:2] / f'{key}.json'
+
+    def _highlight_path(self, lang, code):
+        key = self._hash({'versions': self.versions, 'lang': lang, 'code': code})
+        return self.directory / 'highlight' / key[:2] / f'{key}.html'
+
+    def get_highlighted(self, lang, code):
+        """Return cached highlighted HTML for a code block, or None"""
+        try:
+            return self._highlight_path(lang, code).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+
+    def set_highlighted(self, lang, code, html):
+        """Store highlighted HTML for a code block"""
+        write_atomically(
+            self._highlight_path(lang, code), html.encode('utf-8'),
+        )
+
+    def get(self, key, base_path, *, dependencies=None):
+        """Return the cached page for `key`, or None
+
+        None is also returned if any of the recorded dependencies
+        (relative to `base_path`) changed.
+        If `dependencies` (a set) is given, paths of the recorded
+        dependencies of a returned page are added to it.
+        """
+        entry = self._load_entry(key)
+        if entry is None:
+            return None
+        for filename, digest in entry['dependencies'].items():
+            if digest == MISSING:
+                if os.path.lexists(base_path / filename):
+                    return None
+                continue
+            try:
+                if hash_file(base_path / filename) != digest:
+                    return None
+            except OSError:
+                return None
+        if dependencies is not None:
+            dependencies.update(
+                base_path / filename for filename in entry['dependencies']
+            )
+        return entry['page']
+
+    def set(self, key, page, dependencies, base_path):
+        """Store a rendered page
+
+        `dependencies` is an iterable of paths of files the render read,
+        or tried to read.
+        """
+        entry = {
+            'dependencies': {
+                Path(dep).relative_to(base_path).as_posix():
+                    hash_or_missing(dep)
+                for dep in sorted(dependencies)
+            },
+            'page': page,
+        }
+        self._store_entry(key, json.dumps(entry, ensure_ascii=False))
+
+    def _load_entry(self, key):
+        try:
+            with open(self._entry_path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _store_entry(self, key, dumped_entry):
+        write_atomically(self._entry_path(key), dumped_entry.encode('utf-8'))
+
+
+class MemoryRenderCache(RenderCache):
+    """RenderCache that keeps rendered pages in memory
+
+    This is meant for long-running processes, like `naucse_render watch`.
+    It can't be shared with worker processes.
+    Highlighted code is only cached in the in-memory LRU (see
+    `markdown.highlight_code`), and compiled templates in the shared Jinja
+    environment, so `directory` is None.
+    """
+    def __init__(self):
+        self.directory = None
+        self._versions = None
+        self._entries = {}
+
+    def __repr__(self):
+        return f'<{type(self).__name__} with {len(self._entries)} entries>'
+
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def get_highlighted(self, lang, code):
+        return None
+
+    def set_highlighted(self, lang, code, html):
+        pass
+
+    def _load_entry(self, key):
+        # Entries are stored serialized, so callers get a fresh copy
+        # they can modify
+        try:
+            return json.loads(self._entries[key])
+        except KeyError:
+            return None
+
+    def _store_entry(self, key, dumped_entry):
+        self._entries[key] = dumped_entry
+
+
+def get_render_cache(cache_dir):
+    """Return a RenderCache for `cache_dir`, or None
+
+    `cache_dir` can be a directory, a RenderCache instance or None.
+    """
+    if cache_dir is None or isinstance(cache_dir, RenderCache):
+        return cache_dir
+    return RenderCache(cache_dir)
+
+
+def write_atomically(path, content):
+    """Write bytes to `path` so concurrent readers never see a partial file
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
@@ -1,9 +1,20 @@
+import contextlib
 import json
+import sys
+import time
 from pathlib import Path
 
 import click
 
 import naucse_render
+import naucse_render.watch
+from naucse_render.lesson import iter_lessons
+from naucse_render.encode import encode_for_json, iterencode_streamed
+from naucse_render.encode import API_VERSION
+from naucse_render.dependencies import read_dependency_graph, get_affected
+from naucse_render.export import STRATEGIES as STATIC_EXPORT_STRATEGIES
+from naucse_render.instrument import stats, start_trace, stop_trace
+from naucse_render.instrument import start_profile, stop_profile, PageProfile
 
 @click.group()
 def main():
@@ -27,10 +38,49 @@ def main():
     '--all/--no-all', 'compile_all', default=None,
     help='Compile all available courses. By default, this is done if '
     + "a default course isn't found")
+@click.option(
+    '--jobs', '-j', default=1, type=click.IntRange(min=0),
+    help='Number of processes to render lessons in (0 means one per CPU)')
+@click.option(
+    '--cache-dir', type=click.Path(file_okay=False, path_type=Path),
+    help='Directory for caching rendered pages between runs')
+@click.option(
+    '--incremental/--no-incremental', default=False,
+    help='Update a previous compile in DIR, only writing changed files')
+@click.option(
+    '--store', 'store_dir', type=click.Path(file_okay=False, path_type=Path),
+    help='Directory for content shared by compiled courses; files in DIR '
+    + 'are hard-linked to it where possible')
+@click.option(
+    '--static-export', default='copy', show_default=True,
+    type=click.Choice(STATIC_EXPORT_STRATEGIES),
+    help='How to put static files into DIR (without --store)')
+@click.option(
+    '--stats/--no-stats', 'show_stats', default=False,
+    help='When finished, print time spent in each stage of the compile')
+@click.option(
+    '--trace', 'trace_path', type=Path, default=None, metavar='FILE',
+    help='Write a trace of the compile to FILE, in the Chrome trace-event '
+    + 'format (for chrome://tracing or Perfetto)')
+@click.option(
+    '--profile-pages', type=click.IntRange(min=1), default=None, metavar='N',
+    help='Profile rendering of each page; when finished, print the N most '
+    + 'expensive pages')
+@click.option(
+    '--profile-output', type=Path, default=None, metavar='FILE',
+    help='Profile rendering of each page; write the results to FILE as JSON')
+@click.option(
+    '--profile-sort', default='wall_time', show_default=True,
+    type=click.Choice(PageProfile._fields[2:]),
+    help='What makes a page expensive, for --profile-pages/--profile-output')
 def compile(
     slug, path, destination, edit_repo_url, edit_repo_branch, compile_all,
+    jobs, cache_dir, incremental, store_dir, static_export, show_stats,
+    trace_path, profile_pages, profile_output, profile_sort,
 ):
     """Compile the given course to a directory with JSON & HTML data"""
+    stats.reset()
+    start = time.perf_counter()
     edit_info = {}
     if edit_repo_url:
         edit_info['url'] = edit_repo_url
@@ -45,24 +95,123 @@ def compile(
         click.fail('Cannot use --all with --slug.')
     if slug == '':
         slug = None
-    if compile_all:
-        for slug in naucse_render.get_course_slugs(path=path):
-            if slug is None:
-                click.fail('Cannot use --all with a default course.')
-            slug = removeprefix(slug, 'courses/')
+    jobs = jobs or None
+    with tracing(trace_path), profiling_pages(
+        profile_pages, profile_output, profile_sort,
+    ):
+        if compile_all:
+            destinations = {}
+            for slug in naucse_render.get_course_slugs(path=path):
+                if slug is None:
+                    click.fail('Cannot use --all with a default course.')
+                slug = removeprefix(slug, 'courses/')
+                destinations[slug] = destination / slug
+            # Lessons shared by several courses are only rendered once
+            naucse_render.compile_many(
+                destinations,
+                path=path,
+                edit_info=edit_info,
+                jobs=jobs,
+                cache_dir=cache_dir,
+                incremental=incremental,
+                store_dir=store_dir,
+                static_export=static_export,
+            )
+        else:
             naucse_render.compile(
                 slug=slug,
                 path=path,
-                destination=destination / slug,
+                destination=destination,
                 edit_info=edit_info,
+                jobs=jobs,
+                cache_dir=cache_dir,
+                incremental=incremental,
+                store_dir=store_dir,
+                static_export=static_export,
             )
-    else:
-        naucse_render.compile(
+    if show_stats:
+        elapsed = time.perf_counter() - start
+        print(stats.format(), file=sys.stderr)
+        print(f'Total: {elapsed:.3f} s', file=sys.stderr)
+
+@main.command()
+@click.argument('destination', metavar='DIR', type=Path)
+@click.option(
+    '--slug', default=None,
+    help='Slug of the course to compile')
+@click.option(
+    '--path', default='.', type=click.Path(file_okay=False, exists=True),
+    help='Root of the naucse data repository')
+@click.option(
+    '--edit-repo-url',
+    help='URL to the repository where the content can be edited')
+@click.option(
+    '--edit-repo-branch',
+    help='Branch in the repository where the content can be edited')
+@click.option(
+    '--cache-dir', type=click.Path(file_okay=False, path_type=Path),
+    help='Directory for caching rendered pages (default: cache in memory)')
+@click.option(
+    '--interval', default=0.5, type=click.FloatRange(min=0),
+    help='How often to check for changes, in seconds')
+def watch(
+    slug, path, destination, edit_repo_url, edit_repo_branch, cache_dir,
+    interval,
+):
+    """Compile the given course, and re-compile it when sources change
+
+    Only pages affected by a change are rendered again, and only changed
+    files in DIR are rewritten.
+    """
+    edit_info = {}
+    if edit_repo_url:
+        edit_info['url'] = edit_repo_url
+    if edit_repo_branch:
+        edit_info['branch'] = edit_repo_branch
+    if slug == '':
+        slug = None
+    try:
+        naucse_render.watch.watch(
             slug=slug,
             path=path,
             destination=destination,
             edit_info=edit_info,
+            cache_dir=cache_dir,
+            interval=interval,
         )
+    except KeyboardInterrupt:
+        pass
+
+@contextlib.contextmanager
+def tracing(trace_path):
+    """Record a trace in the `with` block, if `trace_path` is given"""
+    if not trace_path:
+        yield
+        return
+    start_trace()
+    try:
+        yield
+    finally:
+        stop_trace().write(trace_path)
+
+
+@contextlib.contextmanager
+def profiling_pages(top, output, sort_key):
+    """Profile pages rendered in the `with` block, if `top` or `output` is set
+    """
+    if not (top or output):
+        yield
+        return
+    start_profile()
+    try:
+        yield
+    finally:
+        profile = stop_profile()
+        if output:
+            profile.write(output, key=sort_key)
+        if top:
+            print(profile.format(top, key=sort_key), file=sys.stderr)
+
 
 def removeprefix(string, prefix):
     """str.removeprefix(). Remove when support for Python 3.8 is droped."""
@@ -94,12 +243,91 @@ def get_course(slug, path, version):
 @click.option(
     '--path', default='.', type=click.Path(file_okay=False, exists=True),
     help='Root of the naucse data repository')
-def get_lessons(slugs, path):
-    """Print lessons in JSON format"""
+@click.option(
+    '--jobs', '-j', default=1, type=click.IntRange(min=0),
+    help='Number of processes to render lessons in (0 means one per CPU)')
+@click.option(
+    '--cache-dir', type=click.Path(file_okay=False, path_type=Path),
+    help='Directory for caching rendered pages between runs')
+@click.option(
+    '--profile-pages', type=click.IntRange(min=1), default=None, metavar='N',
+    help='Profile rendering of each page; when finished, print the N most '
+    + 'expensive pages')
+@click.option(
+    '--profile-output', type=Path, default=None, metavar='FILE',
+    help='Profile rendering of each page; write the results to FILE as JSON')
+@click.option(
+    '--profile-sort', default='wall_time', show_default=True,
+    type=click.Choice(PageProfile._fields[2:]),
+    help='What makes a page expensive, for --profile-pages/--profile-output')
+def get_lessons(
+    slugs, path, jobs, cache_dir, profile_pages, profile_output, profile_sort,
+):
+    """Print lessons in JSON format
+
+    Lessons are printed as they're rendered. If rendering fails, the output
+    is incomplete (not valid JSON), and the exit status is non-zero.
+    """
     if path:
         path = Path(path)
 
-    result = naucse_render.get_lessons(slugs, path=path)
+    # (dict.fromkeys removes duplicate slugs, keeping the order)
+    lessons = iter_lessons(
+        dict.fromkeys(slugs), path=path, jobs=jobs or None,
+        cache_dir=cache_dir,
+    )
+    result = {'api_version': encode_for_json(API_VERSION)}
+
+    # Print lessons as they're rendered, rather than all at once at the end
+    with profiling_pages(profile_pages, profile_output, profile_sort):
+        for chunk in iterencode_streamed(
+            result, ['data'], lessons, indent=4, ensure_ascii=False,
+        ):
+            sys.stdout.write(chunk)
+    sys.stdout.write('\n')
+
+@main.command()
+@click.option(
+    '--slug', default=None,
+    help='Slug of the course to check')
+@click.option(
+    '--path', default='.', type=click.Path(file_okay=False, exists=True),
+    help='Root of the naucse data repository')
+@click.option(
+    '--jobs', '-j', default=1, type=click.IntRange(min=0),
+    help='Number of processes to render lessons in (0 means one per CPU)')
+@click.option(
+    '--cache-dir', type=click.Path(file_okay=False, path_type=Path),
+    help='Directory for caching rendered pages between runs')
+def check_links(slug, path, jobs, cache_dir):
+    """Check links in the given course, without writing any output
+
+    All broken links are listed. The exit status is 1 if there are any.
+    """
+    if slug == '':
+        slug = None
+    problems = naucse_render.check_links(
+        slug, path=path, jobs=jobs or None, cache_dir=cache_dir,
+    )
+    for problem in problems:
+        print(f'{problem.lesson_slug} ({problem.page_slug}): {problem.message}')
+    if problems:
+        print(f'{len(problems)} broken link(s)', file=sys.stderr)
+        sys.exit(1)
+
+@main.command()
+@click.argument(
+    'compiled', metavar='DIR', type=click.Path(file_okay=False, path_type=Path),
+)
+@click.argument('changed', metavar='FILE...', nargs=-1)
+def affected(compiled, changed):
+    """Print which pages of a compiled course depend on the given files
+
+    DIR is the output of a previous `compile`. FILEs are paths relative to
+    the root of the naucse data repository, e.g. from `git diff --name-only`.
+    """
+    graph = read_dependency_graph(compiled)
+    result = get_affected(graph, changed)
 
     print(json.dumps(result, indent=4, ensure_ascii=False))
 
@@ -1,13 +1,32 @@
 from pathlib import Path
+from itertools import chain
+import collections
+import filecmp
+import copy
 import json
+import os
 import shutil
-from urllib.parse import urlsplit, parse_qsl, urlunsplit
+import tempfile
+from urllib.parse import urlsplit, parse_qsl
 
 from .course import get_course
-from .lesson import get_lessons
+from .load import record_read_yaml
+from .lesson import iter_lessons, map_lesson_jobs
+from .cache import get_render_cache
+from .store import get_content_store
+from .export import export_if_changed, is_exported
+from .export import STRATEGIES as STATIC_EXPORT_STRATEGIES
+from .encode import encode_for_json, iterencode_streamed
+from .instrument import stats
+from .dependencies import (
+    DEPENDENCIES_FILENAME, get_dependency_graph, dump_dependency_graph,
+)
 
 
-def compile(slug=None, *, path='.', destination, edit_info=None):
+def compile(
+    slug=None, *, path='.', destination, edit_info=None, jobs=1,
+    cache_dir=None, incremental=False, store_dir=None, static_export='copy',
+):
     """Compile the given course into a directory
 
     Any existing files in `destination` are removed.
@@ -24,41 +43,373 @@ def compile(slug=None, *, path='.', destination, edit_info=None):
     may change at any time. (Currently, in most cases they'll look reasonable
     to a human, which also helps Git's compression heuristics. But one should
     always look them up in `course.json` rather than guess what they are.)
+
+    Lessons are rendered in `jobs` worker processes, and rendered pages
+    are cached in `cache_dir` if given; see `get_lessons`.
+
+    The output is prepared in a staging directory next to `destination`
+    (named `.<name>.partial`), which replaces `destination` only when
+    the whole course is rendered and its links are checked. If compiling
+    fails, a previous compile in `destination` is left untouched.
+
+    With `incremental=True`, a previous compile in `destination` is updated
+    rather than replaced: files are only written if their content changed,
+    files no longer referenced from `course.json` are removed, and
+    content that was in the previous `course.json` keeps its filename.
+    Changed files are written under temporary names, and renamed only
+    after the course is rendered and its links are checked.
+
+    Lessons are written out as they are rendered, so only one lesson's
+    content needs to be held in memory at a time.
+
+    The source files that each page was rendered from are recorded
+    in `dependencies.json` (see the `dependencies` module).
+
+    If `store_dir` is given, pages and static files are kept in that
+    directory, named by the hash of their content (see `ContentStore`),
+    and hard-linked into `destination` where possible.
+
+    Otherwise, static files are exported to `destination` using the given
+    `static_export` strategy: 'copy', 'hardlink', 'reflink' or 'symlink'
+    (see the `export` module).
     """
-    path = Path(path)
-    destination = Path(destination)
-    info = get_course(slug, path=path)
+    with stats.timer('course', slug=slug):
+        _compile(
+            slug, path=Path(path), destination=destination,
+            edit_info=edit_info, jobs=jobs, cache_dir=cache_dir,
+            incremental=incremental, store_dir=store_dir,
+            static_export=static_export,
+        )
+
+
+def _compile(
+    slug, *, path, destination, edit_info, jobs, cache_dir, incremental,
+    store_dir, static_export,
+):
+    with record_read_yaml() as course_read_files:
+        info = get_course(slug, path=path)
     course_info = info['course']
+    if edit_info:
+        course_info['edit_info'] = edit_info
+
+    writer = CourseWriter(
+        info, destination, path, incremental=incremental,
+        store=get_content_store(store_dir), static_export=static_export,
+        course_read_files=course_read_files,
+    )
+    lesson_dependencies = {}
+    lessons = iter_lessons(
+        get_lesson_slugs(course_info), path=path, vars=course_info.get('vars'),
+        jobs=jobs, cache_dir=cache_dir, dependencies=lesson_dependencies,
+    )
+    writer.write(
+        (slug, lesson, lesson_dependencies[slug]) for slug, lesson in lessons
+    )
+
+
+def compile_many(
+    destinations, *, path='.', edit_info=None, jobs=1, cache_dir=None,
+    incremental=False, store_dir=None, static_export='copy',
+):
+    """Compile several courses, each into its own directory
+
+    `destinations` is a dict of {course_slug: destination}.
+    The other arguments are as in `compile`.
+
+    The result is the same as calling `compile` for each course, but
+    a lesson used by several courses with the same vars is only rendered
+    once.
+    As in `compile`, lessons are written out as they are rendered.
+    With `store_dir`, content shared by the courses is only stored once.
 
-    lesson_slugs = get_lesson_slugs(course_info)
-    vars = course_info.get('vars')
-    response = get_lessons(lesson_slugs, path=path, vars=vars)
-    course_info['lessons'] = response['data']
+    Courses are finished (and replace their previous output) one by one,
+    after all lessons are rendered. If rendering or a link check fails,
+    courses that weren't finished keep their previous output.
 
-    info_path = destination / 'course.json'
-    if destination.exists():
-        if (
-            not info_path.exists()
-            and any(destination.iterdir())
+    For statistics and traces (see the `instrument` module), the whole call
+    is timed as a `compile_many` stage. Lessons are shared between courses,
+    so they can't be attributed to any one of them: only writing each
+    course out is timed as its `course` stage.
+    """
+    with stats.timer('compile_many', slugs=list(destinations)):
+        _compile_many(
+            destinations, path=Path(path), edit_info=edit_info, jobs=jobs,
+            cache_dir=cache_dir, incremental=incremental,
+            store_dir=store_dir, static_export=static_export,
+        )
+
+
+def _compile_many(
+    destinations, *, path, edit_info, jobs, cache_dir, incremental,
+    store_dir, static_export,
+):
+    store = get_content_store(store_dir)
+    writers = {}
+    # (lesson_slug, vars_key) -> [(lesson_slug, vars), [writers]]
+    lesson_jobs = {}
+    try:
+        for slug, destination in destinations.items():
+            with record_read_yaml() as course_read_files:
+                info = get_course(slug, path=path)
+            course_info = info['course']
+            if edit_info:
+                course_info['edit_info'] = edit_info
+            writer = writers[slug] = CourseWriter(
+                info, destination, path, incremental=incremental, store=store,
+                static_export=static_export,
+                course_read_files=course_read_files,
+            )
+            vars = course_info.get('vars')
+            vars_key = json.dumps(encode_for_json(vars), sort_keys=True)
+            for lesson_slug in get_lesson_slugs(course_info):
+                job = lesson_jobs.setdefault(
+                    (lesson_slug, vars_key), [(lesson_slug, vars or {}), []],
+                )
+                job[1].append(writer)
+
+        jobs_list = [args for args, job_writers in lesson_jobs.values()]
+        results = map_lesson_jobs(
+            jobs_list, path.resolve(), jobs=jobs,
+            cache=get_render_cache(cache_dir),
+        )
+        for (args, job_writers), (lesson, dependencies) in zip(
+            lesson_jobs.values(), results,
         ):
-            raise ValueError(
-                f"`{destination}` exists "
-                + "(and is not empty and doesn't contain previous info); "
-                + "delete it before compiling into it."
+            if lesson is None:
+                continue
+            lesson = encode_for_json(lesson)
+            # Externalizing modifies the lesson data, so each additional
+            # course gets its own copy (made before the data is modified)
+            *other_writers, last_writer = job_writers
+            for writer in other_writers:
+                writer.add_lesson(
+                    args[0], copy.deepcopy(lesson), dependencies,
+                )
+            last_writer.add_lesson(args[0], lesson, dependencies)
+        for slug in list(writers):
+            with stats.timer('course', slug=slug):
+                writers.pop(slug).write()
+    except BaseException:
+        # Clean up courses that weren't written yet.
+        # (Their previous output is left intact; see `CourseWriter`.)
+        for writer in writers.values():
+            writer.abort()
+        raise
+
+
+class CourseWriter:
+    """Writes a compiled course into `destination`
+
+    `info` is course info as returned by `get_course`, without lessons.
+    Lessons are added as they're rendered (either using `add_lesson`,
+    or given to `write`), and their content is written to external files
+    right away (see `Externalizer`).
+    `write` then writes `course.json` and `dependencies.json`.
+    Until then, only the information needed to check links is kept
+    in memory for each lesson.
+
+    `course_read_files` are the YAML files `info` was read from
+    (see `load.record_read_yaml`); they're recorded in `dependencies.json`.
+
+    See `compile` for details on `destination` and `incremental`,
+    and `Externalizer` for `store` and `static_export`.
+    """
+    def __init__(
+        self, info, destination, source_path, *, incremental=False,
+        store=None, static_export='copy', course_read_files=(),
+    ):
+        self.info = info
+        self.course_read_files = course_read_files
+        self.destination = destination = Path(destination)
+        self.source_path = Path(source_path)
+
+        previous_info = None
+        if destination.exists():
+            if (
+                not (destination / 'course.json').exists()
+                and any(destination.iterdir())
+            ):
+                raise ValueError(
+                    f"`{destination}` exists "
+                    + "(and is not empty and doesn't contain previous info); "
+                    + "delete it before compiling into it."
+                )
+            if incremental:
+                previous_info = read_previous_info(destination / 'course.json')
+        self.previous_info = previous_info
+
+        if previous_info is None:
+            # Output is built in a staging directory, which replaces
+            # `destination` only when it's complete (see `write`)
+            self.output_path = get_staging_path(destination)
+            if self.output_path.exists():
+                # Left over from an interrupted compile
+                shutil.rmtree(self.output_path)
+        else:
+            # Changed files are written under temporary names, and renamed
+            # only when the output is complete (see `Externalizer.commit`)
+            self.output_path = destination
+        self.output_path.mkdir(exist_ok=True, parents=True)
+
+        self.externalizer = Externalizer(
+            self.output_path, self.source_path, previous_info=previous_info,
+            store=store, static_export=static_export,
+            staged=previous_info is not None,
+        )
+
+        # Only what's needed to check links (see `get_link_info`) is kept
+        # for each lesson until all lessons are rendered
+        self.link_info = {}
+        self.lesson_dependencies = {}
+
+        # Lessons added before `write` are kept, as JSON, in a temporary
+        # file: {lesson_slug: (offset, size)}
+        self._spool = None
+        self._spooled = {}
+
+    def add_lesson(self, lesson_slug, lesson_info, dependencies):
+        """Externalize a rendered lesson and add it to the course
+
+        `dependencies` are the lesson's source files, as filled by
+        `iter_lessons`.
+        The externalized lesson info is kept in a temporary file
+        until `write`, rather than in memory.
+        """
+        self._add_lesson(lesson_slug, lesson_info, dependencies)
+        if self._spool is None:
+            self._spool = tempfile.TemporaryFile()
+        encoded = json.dumps(lesson_info, ensure_ascii=False).encode('utf-8')
+        offset = self._spool.seek(0, os.SEEK_END)
+        self._spool.write(encoded)
+        self._spooled[lesson_slug] = offset, len(encoded)
+
+    def _add_lesson(self, lesson_slug, lesson_info, dependencies):
+        self.externalizer.externalize_lesson(lesson_slug, lesson_info)
+        self.link_info[lesson_slug] = get_link_info(lesson_info)
+        self.lesson_dependencies[lesson_slug] = dependencies
+
+    def _spooled_lessons(self):
+        for lesson_slug, (offset, size) in sorted(self._spooled.items()):
+            self._spool.seek(offset)
+            yield lesson_slug, json.loads(self._spool.read(size))
+
+    def _added_lessons(self, lessons):
+        for lesson_slug, lesson_info, dependencies in lessons:
+            self._add_lesson(lesson_slug, lesson_info, dependencies)
+            yield lesson_slug, lesson_info
+
+    def _close_spool(self):
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+    def write(self, lessons=()):
+        """Write course.json and dependencies.json; finish the output
+
+        Lessons added so far are included, followed by those in `lessons`,
+        an iterable of (lesson_slug, lesson_info, dependencies) triples
+        sorted by slug. These are added as they're consumed.
+
+        The output replaces `destination` only if everything is rendered
+        and all links are good.
+        On failure, output is cleaned up (see `abort`) and the
+        exception is re-raised.
+        """
+        output_path = self.output_path
+        course_info = self.info['course']
+        info_path = output_path / 'course.json'
+        tmp_path = output_path / '.course.json.partial'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for chunk in iterencode_streamed(
+                    self.info, ('course', 'lessons'),
+                    chain(
+                        self._spooled_lessons(),
+                        self._added_lessons(lessons),
+                    ),
+                    sort_keys=True, ensure_ascii=False, indent=4,
+                ):
+                    f.write(chunk)
+            self._close_spool()
+
+            check_lesson_links({**course_info, 'lessons': self.link_info})
+
+            dependencies = dump_dependency_graph(get_dependency_graph(
+                course_info, self.course_read_files, self.lesson_dependencies,
+                self.source_path.resolve(),
+            ))
+        except BaseException:
+            self.abort()
+            raise
+
+        dependencies_path = output_path / DEPENDENCIES_FILENAME
+        if self.previous_info is None:
+            dependencies_path.write_bytes(dependencies)
+            os.replace(tmp_path, info_path)
+            replace_directory(output_path, self.destination)
+        else:
+            self.externalizer.commit()
+            write_if_changed(dependencies_path, dependencies)
+            if filecmp.cmp(tmp_path, info_path, shallow=False):
+                tmp_path.unlink()
+            else:
+                os.replace(tmp_path, info_path)
+            remove_orphans(
+                output_path,
+                {*self.externalizer.outputs, info_path, dependencies_path},
             )
+
+    def abort(self):
+        """Clean up after a failed compile
+
+        Output of the previous compile in `destination` is left as it was.
+        (With a `store`, new files linked from it may be left in an
+        incremental compile's destination; the next successful compile
+        removes them.)
+        """
+        self._close_spool()
+        if self.previous_info is None:
+            shutil.rmtree(self.output_path, ignore_errors=True)
         else:
-            shutil.rmtree(destination)
+            tmp_path = self.output_path / '.course.json.partial'
+            if tmp_path.exists():
+                tmp_path.unlink()
+            self.externalizer.discard()
 
-    check_lesson_links(course_info)
 
-    externalize_content(course_info, destination, path)
+def get_staging_path(destination):
+    """Return the directory where output for `destination` is prepared"""
+    destination = Path(os.path.abspath(destination))
+    return destination.with_name(f'.{destination.name}.partial')
 
-    if edit_info:
-        course_info['edit_info'] = edit_info
 
-    destination.mkdir(exist_ok=True, parents=True)
-    with open(info_path, 'w', encoding='utf-8') as f:
-        json.dump(info, f, sort_keys=True, ensure_ascii=False, indent=4)
+def replace_directory(source, target):
+    """Move the directory `source` to `target`, replacing any old `target`
+
+    The old `target` is moved aside and then removed, so `target` is only
+    missing for the moment between two renames.
+    """
+    if target.exists():
+        old_path = get_staging_path(target).with_suffix('.old')
+        if old_path.exists():
+            shutil.rmtree(old_path)
+        os.rename(target, old_path)
+        os.rename(source, target)
+        shutil.rmtree(old_path)
+    else:
+        os.rename(source, target)
+
+
+def read_previous_info(info_path):
+    """Read `course.json` from a previous compile, or return None"""
+    try:
+        with open(info_path, encoding='utf-8') as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(info, dict) or not isinstance(info.get('course'), dict):
+        return None
+    return info
 
 
 def get_lesson_slugs(course_info):
@@ -71,75 +422,451 @@ def get_lesson_slugs(course_info):
     return sorted(slugs)
 
 
-def unique_path(path):
-    """Generate an unused filename that looks like `path`"""
+def unique_path(path, taken=None):
+    """Generate an unused filename that looks like `path`
+
+    If `taken` is given, it is a set of paths considered used (instead of
+    the ones that exist on disk). The returned path is added to it.
+    """
     # this adds ".1", ".2" etc. before the extension
+    if taken is None:
+        is_taken = Path.exists
+    else:
+        is_taken = taken.__contains__
     orig_suffix = path.suffix
     orig_name = path
     number = 1
-    while path.exists():
+    while is_taken(path):
         path = orig_name.with_suffix(f'.{number}{orig_suffix}')
         number += 1
+    if taken is not None:
+        taken.add(path)
     return path
 
 
-def externalize_content(course_info, destination, source_path):
-    """Move content out of JSON into files; add referenced files"""
-    def externalize(info, key, filename):
-        filename = unique_path(filename)
-        filename.parent.mkdir(exist_ok=True, parents=True)
-        filename.write_text(info[key])
-        info[key] = {'path': str(filename.relative_to(destination))}
+class NameRegistry:
+    """Allocates unused filenames, like `unique_path`, but in memory
 
-    for lesson_slug, lesson_info in course_info.get('lessons', {}).items():
-        short_slug = lesson_slug.rpartition('/')[-1]
-        for page_name, page_info in lesson_info.get('pages', {}).items():
-            filename = Path(short_slug, f'{page_name}.html')
-            externalize(page_info, 'content', destination / filename)
+    Names are only checked against the ones already allocated (or given
+    as `taken`), not against the filesystem. The result is the same as
+    from `unique_path` if no other files are created.
+    For each requested name, the registry remembers which numbered
+    variant to try next, so many collisions on one name don't lead to
+    quadratic behavior.
 
-        for file_name, file_info in lesson_info.get('static_files', {}).items():
-            content = (source_path / file_info.pop('path')).read_bytes()
-            filename = unique_path(Path(destination, short_slug, file_name))
-            filename.parent.mkdir(exist_ok=True, parents=True)
-            filename.write_bytes(content)
-            file_info['path'] = str(filename.relative_to(destination))
+    With `casefold=True`, names that differ only in case are considered
+    the same, as they are on case-insensitive filesystems
+    (see `is_case_insensitive`).
+    """
+    def __init__(self, taken=(), *, casefold=False):
+        self.casefold = casefold
+        self.taken = {self._key(path) for path in taken}
+        self._next_numbers = {}
 
+    def _key(self, path):
+        if self.casefold:
+            return str(path).casefold()
+        return path
 
-def check_lesson_links(course_info):
+    def __contains__(self, path):
+        return self._key(path) in self.taken
+
+    def allocate(self, path):
+        """Return an unused filename that looks like `path`; mark it used
+        """
+        # this adds ".1", ".2" etc. before the extension
+        result = path
+        if result in self:
+            orig_suffix = path.suffix
+            number = self._next_numbers.get(self._key(path), 1)
+            while result in self:
+                result = path.with_suffix(f'.{number}{orig_suffix}')
+                number += 1
+            self._next_numbers[self._key(path)] = number
+        self.taken.add(self._key(result))
+        return result
+
+
+def is_case_insensitive(directory):
+    """Return true if filenames in `directory` are case-insensitive
+
+    This is checked by creating a temporary file, so `directory` must exist
+    and be writable.
+    """
+    with tempfile.NamedTemporaryFile(prefix='.Case-', dir=directory) as f:
+        name = os.path.basename(f.name)
+        return os.path.exists(os.path.join(directory, name.swapcase()))
+
+
+def iter_lesson_items(lesson_slug, lesson_info):
+    """Yield (key, info, filename) for a lesson's content to externalize
+
+    The key identifies the item across compiles. The filename is the default
+    name for the item's file, relative to the destination.
+    """
+    short_slug = lesson_slug.rpartition('/')[-1]
+    for page_name, page_info in lesson_info.get('pages', {}).items():
+        key = lesson_slug, 'pages', page_name
+        yield key, page_info, Path(short_slug, f'{page_name}.html')
+
+    for file_name, file_info in lesson_info.get('static_files', {}).items():
+        key = lesson_slug, 'static_files', file_name
+        yield key, file_info, Path(short_slug, file_name)
+
+
+def get_previous_paths(previous_info):
+    """Get filenames used in a previous `course.json`, by item key"""
+    result = {}
+    used = {Path('course.json')}
+    for lesson_slug, lesson_info in previous_info['course'].get(
+        'lessons', {},
+    ).items():
+        for key, info, filename in iter_lesson_items(lesson_slug, lesson_info):
+            if key[1] == 'pages':
+                info = info.get('content')
+            try:
+                path = Path(info['path'])
+            except (TypeError, KeyError):
+                continue
+            # Don't trust paths that would lead outside the destination
+            if path.is_absolute() or '..' in path.parts:
+                continue
+            if path in used:
+                continue
+            used.add(path)
+            result[key] = path
+    return result
+
+
+def has_content(path, content):
+    """Return true if the file at `path` contains the given bytes"""
+    try:
+        return (
+            path.stat().st_size == len(content)
+            and path.read_bytes() == content
+        )
+    except FileNotFoundError:
+        return False
+
+
+def replace_bytes(path, content):
+    """Write bytes to a new file at `path`, replacing any existing one"""
+    # The file might be a hard link (e.g. to a ContentStore);
+    # replace it rather than overwriting the shared content
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(exist_ok=True, parents=True)
+    path.write_bytes(content)
+
+
+def write_if_changed(path, content):
+    """Write bytes to a file, unless it already has that content"""
+    if not has_content(path, content):
+        replace_bytes(path, content)
+
+
+class Externalizer:
+    """Moves content out of lesson JSON into files in `destination`
+
+    Static files referenced from the lessons are copied from `source_path`.
+    The paths of all written files are collected in `outputs`.
+    Filenames are allocated by a `NameRegistry`, so `destination` should
+    not contain other files (except ones from `previous_info`).
+    If `destination` is on a case-insensitive filesystem, names that differ
+    only in case are not used for different files.
+
+    If `previous_info` (data from `course.json` already in `destination`)
+    is given, the files are updated in place: items that were already there
+    keep their filenames, and files that have the right content
+    aren't rewritten.
+
+    With `staged=True`, changed files are written under temporary names,
+    and only moved into place by `commit` (or removed by `discard`).
+    Files from `previous_info` stay untouched until then.
+
+    If `store` (a `ContentStore`) is given, content is added to it and
+    linked into `destination`, named by its hash.
+    Otherwise, static files are exported using the `static_export` strategy
+    (see `export.export_file`).
+    """
+    def __init__(
+        self, destination, source_path, *, previous_info=None, store=None,
+        static_export='copy', staged=False,
+    ):
+        if static_export not in STATIC_EXPORT_STRATEGIES:
+            raise ValueError(
+                f'Unknown static export strategy: {static_export}'
+            )
+        self.destination = destination
+        self.source_path = source_path
+        self.store = store
+        self.static_export = static_export
+        self.staged = staged
+        # (temporary_path, target) pairs of staged files
+        self.pending = []
+        self.outputs = set()
+        if previous_info is None:
+            self.previous_paths = {}
+        else:
+            self.previous_paths = {
+                key: destination / path
+                for key, path in get_previous_paths(previous_info).items()
+            }
+        # Old names aren't given to new items, even if the old items
+        # turn out to be gone: we don't know that until all lessons
+        # are rendered.
+        self.names = NameRegistry(
+            self.previous_paths.values(),
+            casefold=is_case_insensitive(destination),
+        )
+
+    def externalize_lesson(self, lesson_slug, lesson_info):
+        """Write out a lesson's content; replace it by paths in lesson_info"""
+        with stats.timer('externalize'):
+            self._externalize_lesson(lesson_slug, lesson_info)
+
+    def _externalize_lesson(self, lesson_slug, lesson_info):
+        destination = self.destination
+        store = self.store
+        for key, info, filename in iter_lesson_items(lesson_slug, lesson_info):
+            if key[1] == 'pages':
+                content = info['content'].encode('utf-8')
+                if store is None:
+                    target = self._get_target(key, filename)
+                    if not has_content(target, content):
+                        replace_bytes(self._stage(target), content)
+                else:
+                    name = store.add_bytes(content, filename.suffix)
+                    target = store.export(name, destination)
+                info['content'] = {
+                    'path': str(target.relative_to(destination)),
+                }
+            else:
+                source = self.source_path / info.pop('path')
+                with stats.timer('static_file', path=source):
+                    if store is None:
+                        target = self._get_target(key, filename)
+                        if not is_exported(source, target, self.static_export):
+                            export_if_changed(
+                                source, self._stage(target),
+                                self.static_export,
+                            )
+                    else:
+                        target = store.export(
+                            store.add_file(source), destination,
+                        )
+                info['path'] = str(target.relative_to(destination))
+            self.outputs.add(target)
+
+    def _stage(self, target):
+        """Return the path where new content for `target` should be written
+
+        Without `staged`, that's `target` itself.
+        """
+        if not self.staged:
+            return target
+        tmp_path = target.with_name(f'.{target.name}.partial')
+        self.pending.append((tmp_path, target))
+        return tmp_path
+
+    def commit(self):
+        """Move staged files into place"""
+        for tmp_path, target in self.pending:
+            os.replace(tmp_path, target)
+        self.pending.clear()
+
+    def discard(self):
+        """Remove staged files, and directories that were created for them"""
+        for tmp_path, target in reversed(self.pending):
+            if tmp_path.is_symlink() or tmp_path.exists():
+                tmp_path.unlink()
+            for directory in tmp_path.parents:
+                if directory == self.destination:
+                    break
+                try:
+                    directory.rmdir()
+                except OSError:
+                    # Not empty
+                    break
+        self.pending.clear()
+
+    def _get_target(self, key, filename):
+        try:
+            return self.previous_paths[key]
+        except KeyError:
+            return self.names.allocate(self.destination / filename)
+
+
+def externalize_content(
+    course_info, destination, source_path, *, previous_info=None, store=None,
+    static_export='copy',
+):
+    """Move content out of JSON into files; add referenced files
+
+    Returns the set of paths of the written files.
+    See `Externalizer` for details.
+    """
+    externalizer = Externalizer(
+        destination, source_path, previous_info=previous_info, store=store,
+        static_export=static_export,
+    )
     for lesson_slug, lesson_info in course_info.get('lessons', {}).items():
-        for page_name, page_info in lesson_info.get('pages', {}).items():
-            for link in page_info['links']:
-                check_lesson_link(urlsplit(link), course_info, lesson_slug)
+        externalizer.externalize_lesson(lesson_slug, lesson_info)
+    return externalizer.outputs
+
+
+def remove_orphans(destination, outputs):
+    """Remove files in `destination` that aren't in `outputs`
+
+    Directories that become empty are removed as well.
+    """
+    for dirpath, dirnames, filenames in os.walk(destination, topdown=False):
+        dirpath = Path(dirpath)
+        for filename in filenames:
+            path = dirpath / filename
+            if path not in outputs:
+                path.unlink()
+        if dirpath != destination and not any(dirpath.iterdir()):
+            dirpath.rmdir()
 
 
-def check_lesson_link(parsed_url, course_info, src_lesson_slug):
-    """Check that the given link is included in the course"""
-    if parsed_url.scheme == 'naucse':
-        query = dict(parse_qsl(parsed_url.query))
+LinkProblem = collections.namedtuple(
+    'LinkProblem', ['lesson_slug', 'page_slug', 'link', 'message'],
+)
+
+
+class BrokenLinksError(ValueError):
+    """Raised when a course has links to content that isn't in it
+
+    All problems are reported at once: they're listed in the message,
+    and available as a list of `LinkProblem`s in the `problems` attribute.
+    """
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__(
+            f'{len(problems)} broken link(s):\n'
+            + '\n'.join(f'    {problem.message}' for problem in problems)
+        )
+
+
+class LinkIndex:
+    """Targets that links in a course can point to
+
+    Pages (with their ids) and static files are indexed by lesson, so that
+    each link can be checked with a few dict lookups.
+    """
+    def __init__(self, lessons_info):
+        self.pages = {
+            lesson_slug: {
+                page_slug: frozenset(page_info['ids'])
+                for page_slug, page_info in lesson_info.get('pages', {}).items()
+            }
+            for lesson_slug, lesson_info in lessons_info.items()
+        }
+        self.static_files = {
+            lesson_slug: frozenset(lesson_info.get('static_files', ()))
+            for lesson_slug, lesson_info in lessons_info.items()
+        }
+        # Links are often repeated; they're only parsed once
+        self._parsed = {}
+
+    def _parse(self, link):
+        try:
+            return self._parsed[link]
+        except KeyError:
+            parsed_url = urlsplit(link)
+            result = self._parsed[link] = (
+                parsed_url, dict(parse_qsl(parsed_url.query)),
+            )
+            return result
+
+    def check_link(self, link, src_lesson_slug):
+        """Return a message describing a problem with a link, or None"""
+        parsed_url, query = self._parse(link)
+        if parsed_url.scheme != 'naucse':
+            return None
         if parsed_url.path == 'page':
-            lesson_slug = query['lesson']
+            lesson_slug = query.get('lesson')
             try:
-                target_lesson = course_info['lessons'][lesson_slug]
+                target_lesson = self.pages[lesson_slug]
             except KeyError:
-                raise KeyError(
-                    f"{src_lesson_slug} links to lesson {lesson_slug}, which is not available. Perhaps add it to extra_lessons?")
+                return f"{src_lesson_slug} links to lesson {lesson_slug}, which is not available. Perhaps add it to extra_lessons?"
             page_slug = query.get('page', 'index')
             try:
-                target_page = target_lesson['pages'][page_slug]
+                target_ids = target_lesson[page_slug]
             except KeyError:
-                raise KeyError(
-                    f"{src_lesson_slug} links to missing {page_slug} of lesson {lesson_slug}")
+                return f"{src_lesson_slug} links to missing {page_slug} of lesson {lesson_slug}"
             fragment = parsed_url.fragment
-            if fragment:
-                if fragment not in target_page['ids']:
-                    raise ValueError(
-                        f"{src_lesson_slug} links to #{fragment} in {page_slug} of lesson {lesson_slug}, but there is no such `id` in {target_page['ids']}")
+            if fragment and fragment not in target_ids:
+                return f"{src_lesson_slug} links to #{fragment} in {page_slug} of lesson {lesson_slug}, but there is no such `id` in {sorted(target_ids)}"
         elif parsed_url.path == 'static':
-            filename = query['filename']
-            if filename not in course_info['lessons'][src_lesson_slug]['static_files']:
-                raise KeyError(
-                    f"{src_lesson_slug} links to missing static file {filename}")
+            filename = query.get('filename')
+            if filename not in self.static_files.get(src_lesson_slug, ()):
+                return f"{src_lesson_slug} links to missing static file {filename}"
         elif parsed_url.path == 'solution':
             pass
         else:
-            raise ValueError(f'Unknown naucse link: {urlunsplit(parsed_url)} in {src_lesson_slug}')
+            return f'Unknown naucse link: {link} in {src_lesson_slug}'
+        return None
+
+
+def get_link_info(lesson_info):
+    """Return the parts of lesson info that are needed to check links
+
+    That is, links and ids of each page, and names of static files
+    (in the form `find_link_problems` expects).
+    """
+    return {
+        'pages': {
+            page_slug: {'links': page_info['links'], 'ids': page_info['ids']}
+            for page_slug, page_info in lesson_info.get('pages', {}).items()
+        },
+        'static_files': list(lesson_info.get('static_files', {})),
+    }
+
+
+def find_link_problems(course_info):
+    """Check that all links in the course lead to content included in it
+
+    Returns a list of `LinkProblem`s, empty if all links are good.
+    """
+    lessons_info = course_info.get('lessons', {})
+    index = LinkIndex(lessons_info)
+    problems = []
+    for lesson_slug, lesson_info in lessons_info.items():
+        for page_slug, page_info in lesson_info.get('pages', {}).items():
+            for link in page_info['links']:
+                message = index.check_link(link, lesson_slug)
+                if message is not None:
+                    problems.append(
+                        LinkProblem(lesson_slug, page_slug, link, message),
+                    )
+    return problems
+
+
+def check_lesson_links(course_info):
+    """Raise BrokenLinksError if any links in the course are broken"""
+    with stats.timer('check_links'):
+        problems = find_link_problems(course_info)
+    if problems:
+        raise BrokenLinksError(problems)
+
+
+def check_links(slug=None, *, path='.', jobs=1, cache_dir=None):
+    """Render the given course and check its links, without writing output
+
+    Returns a list of `LinkProblem`s, empty if all links are good.
+    Lessons are rendered as in `compile` (see the arguments there), but
+    only the link information is kept.
+    """
+    path = Path(path)
+    course_info = get_course(slug, path=path)['course']
+    lessons_info = {}
+    for lesson_slug, lesson_info in iter_lessons(
+        get_lesson_slugs(course_info), path=path,
+        vars=course_info.get('vars'), jobs=jobs, cache_dir=cache_dir,
+    ):
+        lessons_info[lesson_slug] = get_link_info(lesson_info)
+    return find_link_problems({**course_info, 'lessons': lessons_info})
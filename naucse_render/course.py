@@ -185,7 +185,9 @@ def update_material(material, vars=None, *, path):
         material.setdefault('type', 'lesson')
         if 'title' not in material:
             # Set title based on the referenced lesson
-            lesson_info = read_yaml(path, 'lessons', lesson_slug, 'info.yml')
+            lesson_info = read_yaml(
+                path, 'lessons', lesson_slug, 'info.yml', frozen=True,
+            )
             material['title'] = lesson_info['title']
     else:
         # External link (or link-less entry)
@@ -0,0 +1,142 @@
+"""
+Record which source files each part of a compiled course was rendered from
+
+The graph is stored next to `course.json` as `dependencies.json`:
+
+    {
+        "api_version": [0, 4],
+        "course": ["courses/foo/info.yml", ...],
+        "course_patterns": ["lessons/*/*/info.yml"],
+        "lessons": {
+            "beginners/install": {
+                "index": ["lessons/beginners/install/index.md", ...],
+                ...
+            },
+            ...
+        }
+    }
+
+Paths are '/'-separated and relative to the repository root.
+"course" lists files that the course data (except lesson content)
+is read from: all YAML files read by `get_course` (including lesson
+`info.yml` files that material titles come from).
+"course_patterns" lists glob patterns (where `*` matches one path
+component) of files whose addition or removal changes the course data.
+The special "lessons" course lists all lessons, so it is affected
+when any lesson is added or removed.
+"""
+
+from fnmatch import fnmatchcase
+from pathlib import Path, PurePosixPath
+import json
+
+from .encode import API_VERSION
+
+DEPENDENCIES_FILENAME = 'dependencies.json'
+
+# Files that make a lesson appear in the "lessons" course
+LESSON_INFO_PATTERN = 'lessons/*/*/info.yml'
+
+
+def get_course_dependencies(course_info, read_files, base_path):
+    """Return a sorted list of files the course data is read from
+
+    `read_files` are paths of YAML files read when loading the course
+    (see `load.record_read_yaml`).
+    """
+    result = {
+        Path(path).relative_to(base_path).as_posix() for path in read_files
+    }
+    source_file = course_info.get('source_file')
+    if source_file and (base_path / source_file).is_file():
+        result.add(PurePosixPath(source_file).as_posix())
+    base_slug = course_info.get('derives')
+    if base_slug:
+        result.add(f'courses/{base_slug}/info.yml')
+    return sorted(result)
+
+
+def get_course_patterns(course_info):
+    """Return glob patterns of files whose presence affects the course"""
+    if course_info.get('source_file') == 'lessons':
+        # The "lessons" course is made from a listing of all lessons
+        return [LESSON_INFO_PATTERN]
+    return []
+
+
+def get_dependency_graph(
+    course_info, course_read_files, lesson_dependencies, base_path,
+):
+    """Return the dependency graph as JSON-compatible data
+
+    `course_read_files` are paths of YAML files read when loading the course
+    (see `load.record_read_yaml`).
+    `lesson_dependencies` is {lesson_slug: {page_slug: [path, ...]}},
+    as filled by `iter_lessons`.
+    """
+    return {
+        'api_version': list(API_VERSION),
+        'course': get_course_dependencies(
+            course_info, course_read_files, base_path,
+        ),
+        'course_patterns': get_course_patterns(course_info),
+        'lessons': lesson_dependencies,
+    }
+
+
+def dump_dependency_graph(graph):
+    """Serialize the dependency graph (deterministically) to bytes"""
+    return json.dumps(
+        graph, sort_keys=True, ensure_ascii=False, indent=4,
+    ).encode('utf-8')
+
+
+def read_dependency_graph(compiled_path):
+    """Read the dependency graph from a compiled course directory"""
+    with open(compiled_path / DEPENDENCIES_FILENAME, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_affected(graph, changed_paths):
+    """Find what in a compiled course is affected by changes to given files
+
+    `changed_paths` are paths relative to the repository root
+    (as given by e.g. `git diff --name-only`).
+
+    Files that were added or removed should be included.
+
+    Returns a dict with:
+    - 'course': True if the course data itself needs to be re-read,
+    - 'lessons': {lesson_slug: [page_slug, ...]} of affected pages.
+    """
+    changed = {PurePosixPath(p).as_posix() for p in changed_paths}
+    lessons = {}
+    for lesson_slug, pages in graph.get('lessons', {}).items():
+        affected_pages = [
+            page_slug for page_slug, paths in pages.items()
+            if not changed.isdisjoint(paths)
+        ]
+        if affected_pages:
+            lessons[lesson_slug] = sorted(affected_pages)
+    course_affected = not changed.isdisjoint(graph.get('course', ())) or any(
+        matches_pattern(path, pattern)
+        for path in changed
+        for pattern in graph.get('course_patterns', ())
+    )
+    return {
+        'course': course_affected,
+        'lessons': lessons,
+    }
+
+
+def matches_pattern(path, pattern):
+    """Return true if a '/'-separated path matches a glob pattern
+
+    Unlike in `fnmatch`, `*` only matches within one path component.
+    """
+    path_parts = path.split('/')
+    pattern_parts = pattern.split('/')
+    return len(path_parts) == len(pattern_parts) and all(
+        fnmatchcase(part, pattern_part)
+        for part, pattern_part in zip(path_parts, pattern_parts)
+    )
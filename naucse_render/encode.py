@@ -1,5 +1,8 @@
 from pathlib import PurePath, PurePosixPath
+from collections.abc import Mapping
 import datetime
+import json
+import uuid
 
 API_VERSION = (0, 4)  # Version 0.3
 
@@ -12,8 +15,9 @@ def encode_for_json(value):
         # Dates are represented as "2019-02-08"
         return value.isoformat()
 
-    elif isinstance(value, dict):
-        # Dicts: Convert keys and values; also ensure keys are str
+    elif isinstance(value, Mapping):
+        # Dicts (and read-only mappings from YAML):
+        # Convert keys and values; also ensure keys are str
         return {
             str(encode_for_json(k)): encode_for_json(v)
             for k, v in value.items()
@@ -39,3 +43,47 @@ def encode_for_json(value):
     # Note: Floats are inexact, and avoided intentionally. Add them if needed.
     raise TypeError(
         f'{value} ({type(value).__name__}) not supported by encode_for_json()')
+
+
+def iterencode_streamed(value, key_path, items, **dump_args):
+    """Encode `value` as JSON in chunks; the result is like json.dumps
+
+    The dict at `key_path` (a sequence of keys) in `value` is not taken
+    from `value`. Instead, its items are taken from `items`, an iterable of
+    (key, value) pairs, which is consumed only as the output is generated.
+    This allows writing large results without holding them in memory.
+
+    `dump_args` are passed to `json.dumps`; `indent` must be an int.
+    With `sort_keys`, the streamed keys must already be sorted.
+    """
+    indent = dump_args['indent']
+    sort_keys = dump_args.get('sort_keys', False)
+    ensure_ascii = dump_args.get('ensure_ascii', True)
+
+    placeholder = f'naucse-stream-{uuid.uuid4()}'
+
+    def _replace(container, key_path):
+        if not key_path:
+            return placeholder
+        key, *rest = key_path
+        return {**container, key: _replace(container.get(key, {}), rest)}
+
+    encoded = json.dumps(_replace(value, list(key_path)), **dump_args)
+    prefix, sep, suffix = encoded.partition(json.dumps(placeholder))
+    assert sep
+
+    yield prefix
+    inner_indent = '\n' + ' ' * indent * (len(key_path) + 1)
+    last_key = None
+    for key, item in items:
+        if sort_keys and last_key is not None and key <= last_key:
+            raise ValueError(f'Streamed keys are not sorted: {key!r}')
+        yield '{' if last_key is None else ','
+        yield inner_indent + json.dumps(key, ensure_ascii=ensure_ascii) + ': '
+        yield json.dumps(item, **dump_args).replace('\n', inner_indent)
+        last_key = key
+    if last_key is None:
+        yield '{}'
+    else:
+        yield '\n' + ' ' * indent * len(key_path) + '}'
+    yield suffix
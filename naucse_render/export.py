@@ -0,0 +1,105 @@
+"""
+Exporting static files into compiled output
+
+Files are copied with `shutil.copyfile`, cloned (reflinks, on filesystems
+that support them), or linked.
+`shutil.copyfile` lets the kernel copy the data where it can (`sendfile`
+on Linux, `fcopyfile` on macOS). Elsewhere, including Windows, it falls
+back to copying through a Python buffer.
+
+Strategies:
+- 'copy': copy the file.
+- 'hardlink': hard-link the file; copy if that's not possible (e.g. when
+  the output is on another filesystem).
+- 'reflink': make a copy-on-write clone of the file; copy if the
+  filesystem doesn't support it.
+- 'symlink': make a symbolic link to the (absolute) source path.
+"""
+
+from pathlib import Path
+import filecmp
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+STRATEGIES = 'copy', 'hardlink', 'reflink', 'symlink'
+
+# Linux ioctl for cloning a file (also known as BTRFS_IOC_CLONE)
+FICLONE = 0x40049409
+
+
+def export_file(source, target, strategy='copy'):
+    """Make the file at `source` available at `target`
+
+    `target` must not exist. Its parent directory is created if needed.
+    """
+    source = Path(source)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if strategy == 'copy':
+        shutil.copyfile(source, target)
+    elif strategy == 'hardlink':
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+    elif strategy == 'reflink':
+        if not _reflink(source, target):
+            shutil.copyfile(source, target)
+    elif strategy == 'symlink':
+        os.symlink(source.resolve(), target)
+    else:
+        raise ValueError(f'Unknown static export strategy: {strategy}')
+
+
+def _reflink(source, target):
+    """Try to clone a file; return True on success"""
+    if fcntl is None:
+        return False
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            success = False
+        else:
+            success = True
+    if not success:
+        os.unlink(target)
+    return success
+
+
+def is_exported(source, target, strategy='copy'):
+    """Return true if `target` is an up-to-date export of `source`"""
+    source = Path(source)
+    try:
+        if strategy == 'symlink':
+            return (
+                target.is_symlink()
+                and Path(os.readlink(target)) == source.resolve()
+            )
+        if target.is_symlink():
+            return False
+        if os.path.samefile(source, target):
+            return strategy == 'hardlink'
+        if strategy == 'hardlink' and target.stat().st_nlink > 1:
+            # A link to some other file
+            return False
+        return filecmp.cmp(source, target, shallow=False)
+    except FileNotFoundError:
+        return False
+
+
+def export_if_changed(source, target, strategy='copy'):
+    """Export a file unless `target` already is an up-to-date export
+
+    An outdated `target` is replaced, not overwritten, so files it might
+    be linked to aren't changed.
+    """
+    if is_exported(source, target, strategy):
+        return
+    if target.is_symlink() or target.exists():
+        target.unlink()
+    export_file(source, target, strategy)
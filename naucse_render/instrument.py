@@ -0,0 +1,349 @@
+"""
+Progress events and per-stage statistics
+
+Events are reported to listeners: functions called with the event name
+and a dict of data. By default, `print_progress` is registered, which
+prints progress messages to stderr.
+Events from lessons rendered in worker processes (see `get_lessons`)
+are only reported to listeners in those processes.
+
+Time spent in each stage of rendering and compiling is added up in
+`stats`, along with counters. Stages can be nested: for example, time
+spent in Markdown conversion includes highlighting code blocks in it.
+Statistics from worker processes are merged into `stats`.
+
+While a trace is active (see `start_trace`), each timed block is also
+recorded as a span in a Chrome trace-event file, which can be viewed in
+chrome://tracing or https://ui.perfetto.dev.
+Spans from worker processes are collected as well.
+
+While a page profile is active (see `start_profile`), the cost of
+rendering each page is recorded, so the most expensive pages can be found.
+"""
+
+from collections import Counter, namedtuple
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# Stages, in the order they're listed in a report.
+# (Others can be added; they're listed after these.)
+STAGES = (
+    'compile_many', 'course', 'lesson', 'yaml', 'render_page', 'jinja',
+    'markdown', 'highlight', 'notebook', 'links', 'check_links',
+    'externalize', 'static_file',
+)
+
+_listeners = []
+
+
+def add_listener(listener):
+    """Register a function to be called as `listener(event, data)`"""
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    """Unregister a listener added by `add_listener`"""
+    _listeners.remove(listener)
+
+
+def emit(event, **data):
+    """Report an event to all listeners"""
+    for listener in _listeners:
+        listener(event, data)
+
+
+def print_progress(event, data):
+    """Default listener: print progress messages to stderr"""
+    if event == 'load_yaml':
+        print('Loading', data['path'], file=sys.stderr)
+    elif event == 'render_page':
+        print(
+            f"Rendering page {data['lesson_slug']} ({data['page_slug']})",
+            file=sys.stderr,
+        )
+
+
+add_listener(print_progress)
+
+
+class Stats:
+    """Aggregated counters, and time spent in each stage"""
+    def __init__(self):
+        self.counts = Counter()
+        self.times = Counter()
+
+    def count(self, name, n=1):
+        """Increment a counter"""
+        self.counts[name] += n
+
+    @contextlib.contextmanager
+    def timer(self, stage, **args):
+        """Measure time spent in the `with` block; count the calls
+
+        If a trace is active, the block is also recorded as a span,
+        with `args` as its arguments.
+        """
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self.times[stage] += (end - start) / 1e9
+            self.counts[stage] += 1
+            if _trace is not None:
+                _trace.add_span(stage, start, end, args)
+
+    def reset(self):
+        self.counts.clear()
+        self.times.clear()
+
+    def as_dict(self):
+        """Return the statistics as (picklable, JSON-compatible) data"""
+        return {'counts': dict(self.counts), 'times': dict(self.times)}
+
+    def merge(self, data):
+        """Add statistics from `as_dict` (e.g. from a worker process)"""
+        self.counts.update(data['counts'])
+        self.times.update(data['times'])
+
+    def format(self):
+        """Return a human-readable breakdown, as a string"""
+        stages = [s for s in STAGES if s in self.counts]
+        stages.extend(sorted(s for s in self.times if s not in STAGES))
+        counters = sorted(c for c in self.counts if c not in self.times)
+        width = max(len(name) for name in [*stages, *counters, 'Stage'])
+        lines = [f"{'Stage':<{width}}  {'Count':>8}  {'Time (s)':>9}"]
+        for stage in stages:
+            lines.append(
+                f'{stage:<{width}}  {self.counts[stage]:>8}'
+                + f'  {self.times[stage]:>9.3f}'
+            )
+        for counter in counters:
+            lines.append(f'{counter:<{width}}  {self.counts[counter]:>8}')
+        return '\n'.join(lines)
+
+
+stats = Stats()
+
+
+class Trace:
+    """Collects spans as Chrome trace events
+
+    Timestamps come from `time.perf_counter_ns`, which uses a system-wide
+    clock, so spans from different processes line up.
+    """
+    def __init__(self):
+        self.events = []
+
+    def add_span(self, name, start_ns, end_ns, args):
+        self.events.append({
+            'name': name,
+            'ph': 'X',
+            'ts': start_ns / 1000,
+            'dur': (end_ns - start_ns) / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_native_id(),
+            'args': args,
+        })
+
+    def as_dict(self):
+        """Return the trace in the Chrome trace-event JSON format"""
+        main_pid = os.getpid()
+        pids = sorted({event['pid'] for event in self.events} | {main_pid})
+        metadata = [
+            {
+                'name': 'process_name',
+                'ph': 'M',
+                'pid': pid,
+                'args': {
+                    'name': 'naucse_render' if pid == main_pid else 'worker',
+                },
+            }
+            for pid in pids
+        ]
+        return {
+            'traceEvents': metadata + self.events,
+            'displayTimeUnit': 'ms',
+        }
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, default=str)
+
+
+# The active Trace, or None
+_trace = None
+
+
+def start_trace():
+    """Start recording spans; return the new active Trace"""
+    global _trace
+    _trace = Trace()
+    return _trace
+
+
+def stop_trace():
+    """Stop recording spans; return the Trace that was active (or None)"""
+    global _trace
+    trace, _trace = _trace, None
+    return trace
+
+
+def get_trace():
+    """Return the active Trace, or None"""
+    return _trace
+
+
+PageProfile = namedtuple('PageProfile', [
+    'lesson_slug', 'page_slug', 'wall_time', 'cpu_time', 'peak_memory',
+    'html_size', 'code_blocks', 'solutions',
+])
+PageProfile.__doc__ = """Cost of rendering one page
+
+Times are in seconds; `peak_memory` (the peak of memory allocated while
+rendering, as measured by tracemalloc) and `html_size` are in bytes.
+"""
+
+
+class Profile:
+    """Collects the cost of rendering each page (see `PageProfile`)"""
+    def __init__(self):
+        self.pages = []
+
+    def measure(self, lesson_slug, page_slug, render):
+        """Call `render()` to render a page, record its cost; return the page
+        """
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        else:
+            # Python 3.8: clearing traces also resets the peak
+            tracemalloc.clear_traces()
+            start_memory = 0
+        start_code_blocks = stats.counts['code_blocks']
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        page = render()
+        wall_time = time.perf_counter() - start
+        cpu_time = time.process_time() - start_cpu
+        self.pages.append(PageProfile(
+            lesson_slug=lesson_slug,
+            page_slug=page_slug,
+            wall_time=wall_time,
+            cpu_time=cpu_time,
+            peak_memory=tracemalloc.get_traced_memory()[1] - start_memory,
+            html_size=len(page['content'].encode('utf-8')),
+            code_blocks=stats.counts['code_blocks'] - start_code_blocks,
+            solutions=len(page['solutions']),
+        ))
+        return page
+
+    def ranked(self, key='wall_time'):
+        """Return the recorded pages, most expensive first"""
+        return sorted(self.pages, key=lambda p: getattr(p, key), reverse=True)
+
+    def format(self, top=10, key='wall_time'):
+        """Return a human-readable report of the `top` most expensive pages"""
+        header = (
+            'Page', 'Wall (s)', 'CPU (s)', 'Peak (KiB)', 'HTML (KiB)',
+            'Code blocks', 'Solutions',
+        )
+        rows = [header]
+        for p in self.ranked(key)[:top]:
+            rows.append((
+                f'{p.lesson_slug} ({p.page_slug})',
+                f'{p.wall_time:.3f}', f'{p.cpu_time:.3f}',
+                f'{p.peak_memory / 1024:.0f}', f'{p.html_size / 1024:.1f}',
+                str(p.code_blocks), str(p.solutions),
+            ))
+        width = max(len(row[0]) for row in rows)
+        lines = []
+        for name, *columns in rows:
+            lines.append(f'{name:<{width}}' + ''.join(
+                f'  {column:>{len(title)}}'
+                for column, title in zip(columns, header[1:])
+            ))
+        return '\n'.join(lines)
+
+    def write(self, path, key='wall_time'):
+        """Write all recorded pages as JSON, most expensive first"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([p._asdict() for p in self.ranked(key)], f, indent=4)
+
+
+# The active Profile, or None
+_profile = None
+_started_tracemalloc = False
+
+
+def start_profile():
+    """Start profiling pages; return the new active Profile
+
+    This starts tracemalloc, which slows down rendering.
+    """
+    global _profile, _started_tracemalloc
+    _profile = Profile()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    return _profile
+
+
+def stop_profile():
+    """Stop profiling pages; return the Profile that was active (or None)"""
+    global _profile, _started_tracemalloc
+    profile, _profile = _profile, None
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    return profile
+
+
+def get_profile():
+    """Return the active Profile, or None"""
+    return _profile
+
+
+def get_worker_options():
+    """Return what a worker process should record (see `start_worker`)"""
+    return {'trace': _trace is not None, 'profile': _profile is not None}
+
+
+def start_worker(options):
+    """Set up instrumentation in a worker process, for one task
+
+    `options` are from `get_worker_options` in the parent process.
+    """
+    stats.reset()
+    if options['trace']:
+        start_trace()
+    else:
+        stop_trace()
+    if options['profile']:
+        start_profile()
+    else:
+        stop_profile()
+
+
+def get_worker_results():
+    """Return data recorded in a worker, for `merge_worker_results`"""
+    return {
+        'stats': stats.as_dict(),
+        'trace': _trace.events if _trace else None,
+        'profile': _profile.pages if _profile else None,
+    }
+
+
+def merge_worker_results(results):
+    """Add data from `get_worker_results` to this process's instrumentation
+    """
+    stats.merge(results['stats'])
+    if _trace is not None and results['trace']:
+        _trace.events.extend(results['trace'])
+    if _profile is not None and results['profile']:
+        _profile.pages.extend(results['profile'])
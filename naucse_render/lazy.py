@@ -0,0 +1,128 @@
+"""
+Lazy API: lessons and pages that are rendered on demand
+
+This is meant for tools like a local preview server, which should be able
+to serve one page without rendering the whole lesson (or course).
+Data is computed on first access, and then kept.
+"""
+
+from functools import cached_property
+from pathlib import Path
+
+from .lesson import read_lesson_info
+from .page import render_page
+from .cache import get_render_cache
+from .encode import encode_for_json
+
+
+class LazyLesson:
+    """A lesson whose pages are rendered when their content is needed
+
+    Creating a LazyLesson doesn't read anything; the lesson's `info.yml`
+    is read when any information is first needed.
+    `vars`, `path` and `cache_dir` are as in `get_lessons`.
+    """
+    def __init__(self, slug, vars=None, path='.', *, cache_dir=None):
+        self.slug = slug
+        self.vars = vars or {}
+        self.base_path = Path(path).resolve()
+        self.cache = get_render_cache(cache_dir)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.slug}>'
+
+    @cached_property
+    def _info(self):
+        return read_lesson_info(self.slug, self.base_path)
+
+    @property
+    def title(self):
+        return self._info[0]['title']
+
+    @property
+    def source_file(self):
+        return self._info[0]['source_file']
+
+    @property
+    def static_files(self):
+        return self._info[0]['static_files']
+
+    @cached_property
+    def pages(self):
+        """Dict of {page_slug: LazyPage}"""
+        lesson_info, lesson_vars, pages_info = self._info
+        page_vars = {**self.vars, **lesson_vars}
+        return {
+            slug: LazyPage(self, slug, info, page_vars)
+            for slug, info in pages_info.items()
+        }
+
+    def to_dict(self):
+        """Return lesson info, as from `get_lessons` (renders all pages)"""
+        return encode_for_json({
+            **self._info[0],
+            'pages': {
+                slug: page.to_dict() for slug, page in self.pages.items()
+            },
+        })
+
+
+class LazyPage:
+    """A lesson page that is rendered when its content is needed
+
+    Metadata from `info.yml` (`title`, `subtitle`, `info`) is available
+    without rendering.
+    Accessing `content`, `solutions`, `links`, `ids` or `dependencies`
+    renders the page (see `render_page`), once.
+    """
+    def __init__(self, lesson, slug, info, vars):
+        self.lesson = lesson
+        self.slug = slug
+        self.info = info
+        self.vars = vars
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.lesson.slug} ({self.slug})>'
+
+    @property
+    def title(self):
+        return self.info['title']
+
+    @property
+    def subtitle(self):
+        return self.info.get('subtitle')
+
+    @cached_property
+    def _rendered(self):
+        dependencies = {self.lesson.source_file.as_posix()}
+        page = render_page(
+            self.lesson.slug, self.slug, self.info, self.lesson.base_path,
+            self.vars, cache=self.lesson.cache, dependencies=dependencies,
+        )
+        return page, sorted(dependencies)
+
+    @property
+    def content(self):
+        return self._rendered[0]['content']
+
+    @property
+    def solutions(self):
+        return self._rendered[0]['solutions']
+
+    @property
+    def links(self):
+        return self._rendered[0]['links']
+
+    @property
+    def ids(self):
+        return self._rendered[0]['ids']
+
+    @property
+    def dependencies(self):
+        """Source files of the page (see `get_lesson`)"""
+        return self._rendered[1]
+
+    def to_dict(self):
+        """Return all page info, as in `get_lessons` output"""
+        return self._rendered[0]
+
@@ -6,45 +6,186 @@ render info for items.
 """
 
 from pathlib import Path
+from collections import deque
+from itertools import repeat
 import datetime
 import textwrap
+import os
 
 from .load import read_yaml
-from .page import render_page
+from .cache import get_render_cache
 from .encode import encode_for_json, API_VERSION
+from .instrument import stats, get_worker_options, start_worker
+from .instrument import get_worker_results, merge_worker_results
 
 
-def get_lessons(lesson_slugs, vars=None, path='.'):
+def get_lessons(lesson_slugs, vars=None, path='.', *, jobs=1, cache_dir=None):
     """Return versioned info on all lessons for the given slugs
 
     This entrypoint is here to cut down on repeated Arca calls.
-    """
-    if vars is None:
-        vars = {}
 
-    path = Path(path).resolve()
-    data = {}
-    for slug in lesson_slugs:
-        try:
-            lesson_data = get_lesson(slug, vars, path)
-        except FileNotFoundError:
-            pass
-        else:
-            data[slug] = lesson_data
+    If `jobs` is greater than 1, lessons are rendered in a pool of that many
+    worker processes (`None` means one per CPU).
+    The result is the same as with serial rendering.
+
+    If `cache_dir` is given, rendered pages are cached in that directory
+    and reused in later calls if their sources didn't change.
+    (A `RenderCache` instance can be given instead of a directory.)
+    """
+    data = dict(iter_lessons(
+        lesson_slugs, vars, path, jobs=jobs, cache_dir=cache_dir,
+    ))
     return encode_for_json({
         'api_version': API_VERSION,
         'data': data,
     })
 
 
-def get_lesson(lesson_slug, vars, base_path):
+def iter_lessons(
+    lesson_slugs, vars=None, path='.', *, jobs=1, cache_dir=None,
+    dependencies=None,
+):
+    """Yield (slug, lesson_info) for the given lesson slugs
+
+    This is like `get_lessons`, but lessons are rendered as they're
+    consumed, so all of them don't need to be held in memory at once.
+    Lesson info is JSON-compatible.
+    Lessons that don't exist are skipped.
+
+    If `dependencies` (a dict) is given, the source files of each yielded
+    lesson are stored in it, as {lesson_slug: {page_slug: [path, ...]}}
+    (see `get_lesson`).
+    """
+    if vars is None:
+        vars = {}
+
+    path = Path(path).resolve()
+    cache = get_render_cache(cache_dir)
+    lesson_slugs = list(lesson_slugs)
+    for slug, (lesson_data, lesson_dependencies) in zip(
+        lesson_slugs,
+        map_lessons(lesson_slugs, vars, path, jobs=jobs, cache=cache),
+    ):
+        if lesson_data is not None:
+            if dependencies is not None:
+                dependencies[slug] = lesson_dependencies
+            yield slug, encode_for_json(lesson_data)
+
+
+def map_lessons(lesson_slugs, vars, base_path, *, jobs=1, cache=None):
+    """Render the given lessons, possibly in parallel
+
+    Yields (lesson data, dependencies) pairs in the order of `lesson_slugs`
+    (see `get_lesson`). For lessons that don't exist, both are None.
+
+    In parallel mode, only a few lessons are rendered ahead of the one
+    that's being consumed, so finished results don't pile up in memory.
+    """
+    return map_lesson_jobs(
+        [(slug, vars) for slug in lesson_slugs], base_path,
+        jobs=jobs, cache=cache,
+    )
+
+
+def map_lesson_jobs(lesson_jobs, base_path, *, jobs=1, cache=None):
+    """Render lessons given as a list of (lesson_slug, vars) pairs
+
+    This is like `map_lessons`, but each lesson can use different vars.
+    """
+    args = (
+        [slug for slug, vars in lesson_jobs],
+        [vars for slug, vars in lesson_jobs],
+        repeat(base_path), repeat(cache),
+    )
+    if jobs == 1 or len(lesson_jobs) <= 1:
+        yield from map(_get_lesson_or_none, *args)
+        return
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    from concurrent.futures import ProcessPoolExecutor
+    worker_options = get_worker_options()
+
+    def _get_result(future):
+        result, worker_results = future.result()
+        merge_worker_results(worker_results)
+        return result
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for job_args in zip(*args):
+            pending.append(executor.submit(
+                _get_lesson_in_worker, worker_options, *job_args,
+            ))
+            if len(pending) >= jobs * 2:
+                yield _get_result(pending.popleft())
+        while pending:
+            yield _get_result(pending.popleft())
+
+
+def _get_lesson_or_none(lesson_slug, vars, base_path, cache):
+    # Top-level function, so that it can be sent to worker processes
+    dependencies = {}
+    try:
+        lesson = get_lesson(
+            lesson_slug, vars, base_path, cache=cache,
+            dependencies=dependencies,
+        )
+    except FileNotFoundError:
+        return None, None
+    return lesson, dependencies
+
+
+def _get_lesson_in_worker(worker_options, *args):
+    # Return statistics (and trace spans, page profiles) for this lesson
+    # along with the result, so the parent process can merge them
+    start_worker(worker_options)
+    result = _get_lesson_or_none(*args)
+    return result, get_worker_results()
+
+
+def get_lesson(lesson_slug, vars, base_path, *, cache=None, dependencies=None):
     """Get information about a single lesson, including page content.
+
+    If `dependencies` (a dict) is given, it is filled with a sorted list
+    of source files for each page: {page_slug: [path, ...]}.
+    Paths are '/'-separated and relative to `base_path`; they include
+    the lesson's `info.yml` (see `render_page` for the rest).
     """
     # Like course.get_course, this collects data on disk and
     # cleans/aggregates/renders it for the API.
 
+    # (Page rendering needs Jinja, Pygments, etc.; import it when needed)
+    from .page import render_page
+
+    with stats.timer('lesson', slug=lesson_slug):
+        lesson, lesson_vars, pages_info = read_lesson_info(
+            lesson_slug, base_path,
+        )
+        for slug, info in pages_info.items():
+            page_dependencies = {lesson['source_file'].as_posix()}
+            lesson['pages'][slug] = render_page(
+                lesson_slug, slug, info, vars={**vars, **lesson_vars},
+                path=base_path, cache=cache, dependencies=page_dependencies,
+            )
+            if dependencies is not None:
+                dependencies[slug] = sorted(page_dependencies)
+    return lesson
+
+
+def read_lesson_info(lesson_slug, base_path):
+    """Read information about a lesson, without rendering its pages
+
+    Returns a tuple of:
+    - lesson info, with an empty dict for 'pages',
+    - the lesson's vars,
+    - a dict of {page_slug: page info} (the `info` for `render_page`).
+    """
     lesson_path = base_path / 'lessons' / lesson_slug
-    lesson_info = read_yaml(base_path, 'lessons', lesson_slug, 'info.yml')
+    # Read-only cached data; only the top level is copied (and modified)
+    lesson_info = dict(read_yaml(
+        base_path, 'lessons', lesson_slug, 'info.yml', frozen=True,
+    ))
 
     lesson = {
         'title': lesson_info['title'],
@@ -55,8 +196,9 @@ def get_lesson(lesson_slug, vars, base_path):
 
     lesson_vars = lesson_info.pop('vars', {})
 
-    pages_info = lesson_info.pop('subpages', {})
+    pages_info = dict(lesson_info.pop('subpages', {}))
     pages_info.setdefault('index', {'title': lesson_info['title']})
+    result = {}
     for slug, page_info in pages_info.items():
         info = {**lesson_info, 'title': None, **page_info}
         if 'title' not in page_info:
@@ -65,11 +207,8 @@ def get_lesson(lesson_slug, vars, base_path):
             except KeyError:
                 raise ValueError(f"'subtitle' is required for page {lesson_slug}/{slug}")
             info['title'] = f"{lesson_info['title']} – {subtitle}"
-        lesson['pages'][slug] = render_page(
-            lesson_slug, slug, info, vars={**vars, **lesson_vars},
-            path=base_path,
-        )
-    return lesson
+        result[slug] = info
+    return lesson, lesson_vars, result
 
 
 def get_static_files(base_path, lesson_path):
@@ -0,0 +1,24 @@
+"""Custom Pygments lexers
+
+This is imported only when code is highlighted (see `markdown.py`).
+"""
+
+from pygments.lexer import RegexLexer, bygroups
+from pygments.token import Generic, Text, Comment
+
+
+class MSDOSSessionVenvLexer(RegexLexer):
+    """Lexer for simplistic MSDOS sessions with optional venvs.
+
+    Note that this doesn't use ``Name.Builtin`` (class="nb"), which naucse
+    styles the same as the rest of the command.
+    """
+    name = 'MSDOS Venv Session'
+    aliases = ['dosvenv']
+    tokens = {
+        'root': [
+            (r'((?:\([_\w]+\))?\s?>\s?)([^#\n]*)(#.*)?',
+             bygroups(Generic.Prompt, Text, Comment)),
+            (r'(.+)', Generic.Output),
+        ]
+    }
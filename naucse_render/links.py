@@ -0,0 +1,97 @@
+"""
+Collect links and ids from HTML as it is rendered
+
+Rather than parsing the finished page, links (`href` and `src` attributes)
+and `id`s are recorded while rendering: Markdown links, images and headings
+are recorded by the renderer, and raw HTML (in Markdown or from nbconvert)
+is scanned by a lightweight tokenizer that doesn't build a document tree.
+The result should match what an HTML parser finds (the tests compare it
+with lxml).
+"""
+
+import html
+import re
+
+# Start tags (with attributes), and things that look like tags but
+# should be skipped
+_TAG_RE = re.compile(r'''
+    <!--.*?-->                                  # comment
+    | <[!?][^>]*>                               # doctype, CDATA, PI
+    | <(?P<name>[a-zA-Z][^\s/>]*)               # start tag
+      (?P<attrs>(?:"[^"]*"|'[^']*'|[^'">])*)
+      >
+''', re.VERBOSE | re.DOTALL)
+
+_ATTR_RE = re.compile(r'''
+    (?P<name>[^\s/>"'=]+)
+    (?:
+        \s*=\s*
+        (?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<uq>[^\s>]+))
+    )?
+''', re.VERBOSE)
+
+# Elements whose content is text, not HTML
+_RAW_TEXT_END_RES = {
+    name: re.compile(fr'</{name}\s*>', re.IGNORECASE)
+    for name in ('script', 'style')
+}
+
+_LINK_ATTRIBUTES = {'href', 'src'}
+
+
+class LinkCollector:
+    """Collects links and ids of a page"""
+    def __init__(self):
+        self.links = set()
+        self.ids = set()
+
+    def add_link(self, url):
+        if url:
+            self.links.add(url)
+
+    def add_id(self, id):
+        if id:
+            self.ids.add(id)
+
+    def scan_html(self, text):
+        """Record links and ids from all tags in an HTML fragment"""
+        pos = 0
+        while True:
+            match = _TAG_RE.search(text, pos)
+            if match is None:
+                return
+            pos = match.end()
+            name = match['name']
+            if name is None:
+                continue
+            if match['attrs']:
+                self._scan_attributes(match['attrs'])
+            end_re = _RAW_TEXT_END_RES.get(name.lower())
+            if end_re is not None:
+                end_match = end_re.search(text, pos)
+                pos = len(text) if end_match is None else end_match.end()
+
+    def _scan_attributes(self, attrs):
+        seen = set()
+        for match in _ATTR_RE.finditer(attrs):
+            name = match['name'].lower()
+            if name in seen:
+                # The first of duplicate attributes is used
+                continue
+            seen.add(name)
+            if name in _LINK_ATTRIBUTES or name == 'id':
+                value = match['dq']
+                if value is None:
+                    value = match['sq']
+                if value is None:
+                    value = match['uq']
+                if value:
+                    value = html.unescape(value)
+                    if name == 'id':
+                        self.add_id(value)
+                    else:
+                        self.add_link(value)
+
+    def as_dict(self):
+        """Return sorted links and ids"""
+        return {'links': sorted(self.links), 'ids': sorted(self.ids)}
@@ -1,13 +1,24 @@
 from pathlib import Path
-import functools
-import sys
-import copy
+import collections
+import contextlib
+import contextvars
+import threading
+import types
 
 import yaml
 
+from .instrument import emit, stats
 
-class YamlLoader(yaml.SafeLoader):
-    """Custom YAML loader"""
+
+class PyYamlLoader(yaml.SafeLoader):
+    """Custom YAML loader, in pure Python"""
+
+
+if getattr(yaml, '__with_libyaml__', False):
+    class YamlLoader(yaml.CSafeLoader):
+        """Custom YAML loader, using the (much faster) libyaml parser"""
+else:
+    YamlLoader = PyYamlLoader
 
 # Disallow duplicate keys.
 # Workaround for PyYAML issue: https://github.com/yaml/pyyaml/issues/165
@@ -25,25 +36,151 @@ def construct_maping(loader, node, deep=False):
         result[key] = loader.construct_object(value_node, deep=deep)
     return result
 
-YamlLoader.add_constructor(
-    yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
-    construct_maping,
+for _loader in {PyYamlLoader, YamlLoader}:
+    _loader.add_constructor(
+        yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
+        construct_maping,
+    )
+
+
+def freeze(value):
+    """Return an immutable version of YAML data
+
+    Dicts are converted to read-only mappings (MappingProxyType),
+    lists to tuples and sets to frozensets.
+    """
+    if isinstance(value, dict):
+        return types.MappingProxyType(
+            {key: freeze(item) for key, item in value.items()}
+        )
+    elif isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    elif isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+def thaw(value):
+    """Return a mutable deep copy of data made by `freeze`"""
+    if isinstance(value, types.MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    elif isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    elif isinstance(value, frozenset):
+        return set(value)
+    return value
+
+
+def _read_yaml(path):
+    emit('load_yaml', path=path)
+    with stats.timer('yaml', path=path), path.open(encoding='utf-8') as f:
+        return freeze(yaml.load(f, Loader=YamlLoader))
+
+
+CacheInfo = collections.namedtuple(
+    'CacheInfo', ['hits', 'misses', 'evictions', 'size', 'maxsize'],
 )
 
 
-@functools.lru_cache()
-def _read_yaml(path, stat):
-    print('Loading', path, file=sys.stderr)
-    with path.open(encoding='utf-8') as f:
-        return yaml.load(f, Loader=YamlLoader)
+class YamlCache:
+    """Cache of parsed (frozen) YAML files, with at most `maxsize` entries
+
+    There is at most one entry per path. It is only used if the file's
+    stat info (size, modification time, inode number etc.) is unchanged;
+    otherwise the file is parsed again and the new result replaces the old.
+    When the cache is full, the least recently used entry is evicted.
+
+    Applications that keep naucse_render loaded for a long time can
+    use `clear()` or `invalidate()`, and monitor the cache with `info()`.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()  # path -> (stat key, data)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path):
+        """Return frozen data from the YAML file at `path` (a resolved Path)
+        """
+        stat = path.stat()
+        stat_key = (
+            stat.st_dev, stat.st_ino, stat.st_size,
+            stat.st_mtime_ns, stat.st_ctime_ns,
+        )
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stat_key:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        data = _read_yaml(path)
+
+        with self._lock:
+            self._entries[path] = stat_key, data
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return data
+
+    def invalidate(self, path):
+        """Forget the entry for the given path, if any"""
+        with self._lock:
+            self._entries.pop(Path(path).resolve(), None)
+
+    def clear(self):
+        """Forget all entries (the counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        """Return counters and current size, as a CacheInfo named tuple"""
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions,
+                len(self._entries), self.maxsize,
+            )
+
 
+yaml_cache = YamlCache()
 
-def read_yaml(base_path, *path_parts, source_key=None):
+
+# Set of paths of YAML files read in the current `record_read_yaml` block,
+# or None
+_read_files = contextvars.ContextVar('_read_files', default=None)
+
+
+@contextlib.contextmanager
+def record_read_yaml():
+    """Collect (resolved) paths of YAML files read in the `with` block
+
+    Files are included even if they were taken from `yaml_cache`,
+    or if they don't exist (reading them failed).
+    """
+    read_files = set()
+    token = _read_files.set(read_files)
+    try:
+        yield read_files
+    finally:
+        _read_files.reset(token)
+
+
+def read_yaml(base_path, *path_parts, source_key=None, frozen=False):
     """Read the given YAML file
 
     Since YAML reading is an expensive operation, the results are cached
     based on filename and stat info (size, modification time, inode number
-    etc.)
+    etc.); see `YamlCache`.
+
+    By default, the result is a fresh copy that the caller may modify.
+    With `frozen=True`, the cached data is returned directly, as
+    read-only mappings and tuples (see `freeze`). This avoids copying;
+    callers that need to modify some part should copy just that part.
 
     The base_path and path_parts are joined using Path.joinpath, but
     the file may not live outside base_path (e.g. '../foo.yaml' isn't allowed.)
@@ -56,7 +193,17 @@ def read_yaml(base_path, *path_parts, source_key=None):
     if base_path not in yaml_path.parents:
         raise ValueError(f'Invalid path')
 
-    result = copy.deepcopy(_read_yaml(yaml_path, yaml_path.stat()))
+    read_files = _read_files.get()
+    if read_files is not None:
+        read_files.add(yaml_path)
+    result = yaml_cache.get(yaml_path)
+    if frozen:
+        if source_key:
+            result = types.MappingProxyType(
+                {**result, source_key: '/'.join(path_parts)}
+            )
+        return result
+    result = thaw(result)
     if source_key:
         result[source_key] = '/'.join(path_parts)
     return result
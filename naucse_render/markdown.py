@@ -1,15 +1,13 @@
 import unicodedata
 from textwrap import dedent
+import functools
+import html
 import re
 
-from ansi2html import Ansi2HTMLConverter
 import mistune
 from markupsafe import Markup
-import pygments
-import pygments.lexers
-from pygments.lexer import RegexLexer, bygroups
-from pygments.token import Generic, Text, Comment
-import pygments.formatters.html
+
+from .instrument import stats
 
 
 def naucse_admonition_plugin(md):
@@ -63,16 +61,24 @@ def naucse_admonition_plugin(md):
     )
 
 
-ansi_convertor = Ansi2HTMLConverter(inline=True)
+# ansi2html and Pygments are imported (and set up) on first use,
+# so that reading course info doesn't need them.
+
+@functools.lru_cache(maxsize=None)
+def get_ansi_convertor():
+    from ansi2html import Ansi2HTMLConverter
+    return Ansi2HTMLConverter(inline=True)
+
 
-pygments_formatter = pygments.formatters.html.HtmlFormatter(
-    cssclass='highlight'
-)
+@functools.lru_cache(maxsize=None)
+def get_pygments_formatter():
+    import pygments.formatters.html
+    return pygments.formatters.html.HtmlFormatter(cssclass='highlight')
 
 
 def ansi_convert(code):
     replaced = code.replace('\u241b', '\x1b')
-    return ansi_convertor.convert(replaced, full=False)
+    return get_ansi_convertor().convert(replaced, full=False)
 
 
 def style_space_after_prompt(html):
@@ -81,33 +87,54 @@ def style_space_after_prompt(html):
                   html)
 
 
-class MSDOSSessionVenvLexer(RegexLexer):
-    """Lexer for simplistic MSDOS sessions with optional venvs.
-
-    Note that this doesn't use ``Name.Builtin`` (class="nb"), which naucse
-    styles the same as the rest of the command.
-    """
-    name = 'MSDOS Venv Session'
-    aliases = ['dosvenv']
-    tokens = {
-        'root': [
-            (r'((?:\([_\w]+\))?\s?>\s?)([^#\n]*)(#.*)?',
-             bygroups(Generic.Prompt, Text, Comment)),
-            (r'(.+)', Generic.Output),
-        ]
-    }
+def __getattr__(name):
+    # MSDOSSessionVenvLexer moved to the `lexers` module, which imports
+    # Pygments; it's re-exported here only when it's asked for
+    if name == 'MSDOSSessionVenvLexer':
+        from .lexers import MSDOSSessionVenvLexer
+        return MSDOSSessionVenvLexer
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
+@functools.lru_cache(maxsize=None)
 def get_lexer_by_name(lang):
     """
     Workaround for our own lexer. Normally, new lexers have to be added trough
     entrypoints to be locatable by get_lexer_by_name().
+
+    Lexer instances are cached and shared.
     """
     if lang == 'dosvenv':
+        from .lexers import MSDOSSessionVenvLexer
         return MSDOSSessionVenvLexer()
+    import pygments.lexers
     return pygments.lexers.get_lexer_by_name(lang)
 
 
+@functools.lru_cache(maxsize=4096)
+def highlight_code(lang, code, cache=None):
+    """Return `code` highlighted as HTML
+
+    Results are kept in an in-memory LRU cache. If `cache` (a `RenderCache`)
+    is given, they're also stored on disk, so they can be reused in
+    later runs.
+    """
+    if cache is not None:
+        html = cache.get_highlighted(lang, code)
+        if html is not None:
+            return html
+    with stats.timer('highlight'):
+        import pygments
+        lexer = get_lexer_by_name(lang)
+        html = pygments.highlight(
+            code, lexer, get_pygments_formatter(),
+        ).strip()
+        html = style_space_after_prompt(html)
+    if cache is not None:
+        cache.set_highlighted(lang, code, html)
+    return html
+
+
 # https://stackoverflow.com/a/31607735/1107768
 def strip_accents(text: str) -> str:
     """
@@ -132,8 +159,13 @@ def text_to_id(text):
 class NaucseRenderer(mistune.HTMLRenderer):
     code_tmpl = '<div class="highlight"><pre><code>{}</code></pre></div>'
 
-    def __init__(self, convert_url, *args, escape=False, **kwargs):
+    def __init__(
+        self, convert_url, *args, escape=False, cache=None,
+        link_collector=None, **kwargs,
+    ):
         self._convert_url = convert_url
+        self._cache = cache
+        self._links = link_collector
         super().__init__(*args, **kwargs, escape=False)
 
     def naucse_admonition(self, text, title, name):
@@ -143,6 +175,9 @@ class NaucseRenderer(mistune.HTMLRenderer):
 
     def heading(self, text, level, raw=None):
         header_id = text_to_id(text)
+        if self._links is not None:
+            self._links.add_id(header_id)
+            self._links.add_link(f'#{header_id}')
         return f'''<h{level:d} id="{header_id}">{text}
 <a href="#{header_id}" class="header-link">#</a>
 </h{level:d}>\n'''
@@ -157,28 +192,91 @@ class NaucseRenderer(mistune.HTMLRenderer):
         if lang == 'ansi':
             converted = ansi_convert(code)
             return self.code_tmpl.format(converted)
-        lexer = get_lexer_by_name(lang)
-        html = pygments.highlight(code, lexer, pygments_formatter).strip()
-        html = style_space_after_prompt(html)
-        return html
+        stats.count('code_blocks')
+        return highlight_code(lang, code, self._cache)
 
     def link(self, text, url, title=None):
-        return super().link(text, self._convert_url(url), title)
+        url = self._convert_url(url)
+        if self._links is not None:
+            self._links.add_link(html.unescape(self.safe_url(url)))
+        return super().link(text, url, title)
 
     def image(self, alt, url, title=None):
-        return super().image(alt, self._convert_url(url), title)
+        url = self._convert_url(url)
+        if self._links is not None:
+            self._links.add_link(html.unescape(self.safe_url(url)))
+        return super().image(alt, url, title)
+
+    def block_html(self, html):
+        if self._links is not None:
+            self._links.scan_html(html)
+        return super().block_html(html)
+
+    def inline_html(self, html):
+        if self._links is not None:
+            self._links.scan_html(html)
+        return super().inline_html(html)
 
 
-def convert_markdown(text, convert_url=None, *, inline=False):
-    convert_url = convert_url if convert_url else lambda x: x
+def _no_convert_url(url):
+    return url
 
+
+class MarkdownConverter:
+    """A reusable Markdown parser with naucse plugins and renderer
+
+    Creating the parser (and registering plugins) costs more than converting
+    a typical short snippet, so converters are kept in a pool and reused.
+    The URL conversion hook (and link collector) is swapped for each
+    conversion.
+    """
+    def __init__(self):
+        self.renderer = NaucseRenderer(_no_convert_url)
+        self.markdown = mistune.create_markdown(
+            plugins=['def_list', naucse_admonition_plugin],
+            renderer=self.renderer,
+        )
+
+    def convert(self, text, convert_url=None, cache=None, link_collector=None):
+        self.renderer._convert_url = convert_url or _no_convert_url
+        self.renderer._cache = cache
+        self.renderer._links = link_collector
+        try:
+            return self.markdown(text)
+        finally:
+            self.renderer._convert_url = _no_convert_url
+            self.renderer._cache = None
+            self.renderer._links = None
+
+
+# Converters not currently in use. (A converter is taken out of the pool
+# while it's converting, so nested or concurrent conversions get their own.)
+_converter_pool = []
+
+
+def convert_markdown(
+    text, convert_url=None, *, inline=False, cache=None, link_collector=None,
+):
+    """Convert Markdown to HTML
+
+    `convert_url` is called to rewrite the URLs of links and images.
+    `cache` is a `RenderCache` for highlighted code blocks.
+    If `link_collector` (a `links.LinkCollector`) is given, links and ids
+    in the result are recorded in it.
+    """
     text = dedent(text)
 
-    markdown = mistune.create_markdown(
-        plugins=['def_list', naucse_admonition_plugin],
-        renderer=NaucseRenderer(convert_url),
-    )
-    result = markdown(text).strip()
+    try:
+        converter = _converter_pool.pop()
+    except IndexError:
+        converter = MarkdownConverter()
+    try:
+        with stats.timer('markdown'):
+            result = converter.convert(
+                text, convert_url, cache, link_collector,
+            ).strip()
+    finally:
+        _converter_pool.append(converter)
 
     if inline and result.startswith('<p>') and result.endswith('</p>'):
         result = result[len('<p>'):-len('</p>')]
@@ -1,37 +1,80 @@
+import functools
+
 from nbconvert import HTMLExporter
 from nbconvert.filters.highlight import Highlight2HTML
 import nbformat
 import traitlets
 
 from .markdown import convert_markdown
+from .instrument import stats
+
+
+def _no_convert_url(url):
+    return url
 
 
 class NaucseHTMLExporter(HTMLExporter):
-    def __init__(self, convert_url, *args, **kwargs):
-        self._convert_url = convert_url
+    """HTML exporter that uses naucse's Markdown conversion
+
+    Setting up an exporter (traitlets config, the Jinja environment and
+    templates) is expensive, so one exporter is meant to be reused for
+    many notebooks; see `get_exporter`.
+    The URL conversion and render cache are set for each notebook
+    (see `convert`).
+    """
+    def __init__(self, convert_url=None, *args, cache=None, **kwargs):
+        self._convert_url = convert_url or _no_convert_url
+        self._cache = cache
         super().__init__(*args, **kwargs)
+        # The lexer is set for each notebook in from_notebook_node.
+        # (Registering it in `filters` keeps HTMLExporter from creating
+        # a new filter for each notebook.)
+        self._highlight = Highlight2HTML(parent=self)
+        self.filters = {**self.filters, 'highlight_code': self._highlight}
 
     @traitlets.default('template_name')
     def _template_name_default(self):
         return 'basic'
 
-    def from_notebook_node(self, nb, resources=None, **kw):
+    def default_filters(self):
         '''So we could use our own template filters'''
+        for name, jinja_filter in super().default_filters():
+            if name == 'markdown2html':
+                jinja_filter = self._convert_markdown
+            yield name, jinja_filter
+
+    def _convert_markdown(self, text):
+        return convert_markdown(text, self._convert_url, cache=self._cache)
+
+    def from_notebook_node(self, nb, resources=None, **kw):
         langinfo = nb.metadata.get('language_info', {})
         lexer = langinfo.get('pygments_lexer', langinfo.get('name', None))
-        highlight = Highlight2HTML(pygments_lexer=lexer, parent=self)
+        # (Highlight2HTML's default, if the notebook doesn't say)
+        self._highlight.pygments_lexer = lexer or 'ipython3'
+        return super().from_notebook_node(nb, resources, **kw)
 
-        def convert_markdown_contexted(text):
-            return convert_markdown(text, self._convert_url)
+    def convert(self, notebook, convert_url=None, cache=None):
+        """Convert a notebook node to HTML, return the HTML body"""
+        self._convert_url = convert_url or _no_convert_url
+        self._cache = cache
+        try:
+            body, resources = self.from_notebook_node(notebook)
+        finally:
+            self._convert_url = _no_convert_url
+            self._cache = None
+        return body
 
-        self.register_filter('markdown2html', convert_markdown_contexted)
-        self.register_filter('highlight_code', highlight)
-        return super().from_notebook_node(nb, resources, **kw)
+
+@functools.lru_cache(maxsize=None)
+def get_exporter():
+    """Return the exporter shared by all conversions in this process"""
+    return NaucseHTMLExporter()
 
 
-def convert_notebook(raw, convert_url=None):
-    convert_url = convert_url if convert_url else lambda x: x
-    notebook = nbformat.reads(raw, as_version=4)
-    html_exporter = NaucseHTMLExporter(convert_url)
-    body, resources = html_exporter.from_notebook_node(notebook)
-    return body
+def convert_notebook(raw, convert_url=None, *, cache=None):
+    with stats.timer('notebook'):
+        notebook = nbformat.reads(raw, as_version=4)
+        stats.count('code_blocks', sum(
+            cell.cell_type == 'code' for cell in notebook.cells
+        ))
+        return get_exporter().convert(notebook, convert_url, cache=cache)
@@ -1,18 +1,17 @@
 from pathlib import Path, PurePosixPath
-from urllib.parse import urlparse
-from itertools import chain
+from urllib.parse import urlparse, urlsplit, parse_qsl
+import functools
 import types
-import sys
 import re
 
 import jinja2
-import lxml.html
 
-from .templates import environment, vars_functions
+from .templates import environment, vars_functions, record_loaded_templates
 from .markdown import convert_markdown
-from .notebook import convert_notebook
 from .load import read_yaml
 from .encode import encode_for_json
+from .links import LinkCollector
+from .instrument import emit, stats, get_profile
 
 
 def to_list(value):
@@ -76,16 +75,102 @@ def rewrite_relative_url(url, slug):
     return url
 
 
-def render_page(lesson_slug, page_slug, info, path, vars=None):
+@functools.lru_cache(maxsize=None)
+def get_lessons_environment(lessons_path, bytecode_cache_dir=None):
+    """Return the Jinja environment for templates in `lessons_path`
+
+    The environment is shared by all pages, so that templates (such as
+    common layouts) are only compiled once. Changed templates are
+    reloaded automatically.
+
+    If `bytecode_cache_dir` is given, compiled templates are also stored
+    there, so they can be reused by later runs.
+    """
+    if bytecode_cache_dir is None:
+        bytecode_cache = None
+    else:
+        Path(bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(str(bytecode_cache_dir))
+    return environment.overlay(
+        loader=jinja2.FileSystemLoader(str(lessons_path)),
+        bytecode_cache=bytecode_cache,
+    )
+
+
+def render_page(
+    lesson_slug, page_slug, info, path, vars=None, *, cache=None,
+    dependencies=None,
+):
     """Get rendered content and metainformation on one lesson page.
+
+    If `cache` (a `RenderCache`) is given, a previously rendered result
+    is reused if possible. Compiled Jinja templates and highlighted code
+    are also cached there.
+
+    If `dependencies` (a set) is given, the files the page was rendered
+    from are added to it, as '/'-separated paths relative to `path`.
+    These are the page source, Jinja templates it includes or extends
+    (or looked for, but didn't find), its `data` YAML, and static files
+    it links to.
     """
 
     base_path = Path(path).resolve()
-
-    print(f'Rendering page {lesson_slug} ({page_slug})', file=sys.stderr)
     if vars is None:
         vars = {}
 
+    read_files = set()
+    page = None
+    if cache is not None:
+        cache_key = cache.key(lesson_slug, page_slug, info, vars)
+        page = cache.get(cache_key, base_path, dependencies=read_files)
+        stats.count('page_cache_misses' if page is None else 'page_cache_hits')
+
+    if page is None:
+        read_files.clear()
+        emit('render_page', lesson_slug=lesson_slug, page_slug=page_slug)
+        with stats.timer(
+            'render_page', lesson_slug=lesson_slug, page_slug=page_slug,
+        ):
+            render = functools.partial(
+                _render_page,
+                lesson_slug, page_slug, info, base_path, vars, read_files,
+                cache=cache,
+            )
+            profile = get_profile()
+            if profile is None:
+                page = render()
+            else:
+                page = profile.measure(lesson_slug, page_slug, render)
+        if cache is not None:
+            cache.set(cache_key, page, read_files, base_path)
+
+    if dependencies is not None:
+        dependencies.update(
+            Path(p).relative_to(base_path).as_posix() for p in read_files
+        )
+        dependencies.update(get_static_dependencies(page, lesson_slug))
+    return page
+
+
+def get_static_dependencies(page, lesson_slug):
+    """Yield paths of static files that a rendered page links to"""
+    for link in page['links']:
+        parsed = urlsplit(link)
+        if parsed.scheme == 'naucse' and parsed.path == 'static':
+            filename = dict(parse_qsl(parsed.query)).get('filename')
+            if filename:
+                yield f'lessons/{lesson_slug}/static/{filename}'
+
+
+def _render_page(
+    lesson_slug, page_slug, info, base_path, vars, dependencies, *, cache,
+):
+    """Render a page (see render_page)
+
+    Paths of all files read are added to the `dependencies` set.
+    The `cache` is only used for compiled templates and highlighted code.
+    """
+
     lessons_path = base_path / 'lessons'
     lesson_path = lessons_path / lesson_slug
 
@@ -120,16 +205,20 @@ def render_page(lesson_slug, page_slug, info, path, vars=None):
         return convert_markdown(
             text,
             convert_url=convert_page_url,
+            cache=cache,
             **kwargs,
         )
 
     # Jinja pre-processing
     page_path = lesson_path / page_filename
+    dependencies.add(page_path)
     if info.get('jinja', True):
         # Use a Jinja environment to enable includes/template inheritance
-        env = environment.overlay(
-            loader=jinja2.FileSystemLoader(str(lessons_path)),
-        )
+        if cache is None or cache.directory is None:
+            bytecode_cache_dir = None
+        else:
+            bytecode_cache_dir = cache.directory / 'jinja'
+        env = get_lessons_environment(lessons_path, bytecode_cache_dir)
         args = dict(
             lesson_url=lesson_url,
             subpage_url=lambda page: lesson_url(lesson_slug, page=page),
@@ -146,17 +235,27 @@ def render_page(lesson_slug, page_slug, info, path, vars=None):
             lesson=types.SimpleNamespace(slug=lesson_slug),
         )
         if 'data' in info:
-            args['data'] = read_yaml(lesson_path, info['data'])
-        template = env.get_template(f'{lesson_slug}/{page_filename}')
-        text = template.render(**args)
+            args['data'] = read_yaml(lesson_path, info['data'], frozen=True)
+            dependencies.add(lesson_path / info['data'])
+        with record_loaded_templates() as templates, stats.timer('jinja'):
+            template = env.get_template(f'{lesson_slug}/{page_filename}')
+            text = template.render(**args)
+        dependencies.update(Path(t) for t in templates)
     else:
         text = page_path.read_text(encoding='utf-8')
 
-    # Render from input format
+    # Render from input format.
+    # Links and ids are collected during the final conversion.
+    # (Any HTML from earlier conversions, like solutions, is raw HTML there.)
+    link_collector = LinkCollector()
     if info['style'] == 'md':
-        text = page_markdown(text)
+        text = page_markdown(text, link_collector=link_collector)
     elif info['style'] == 'ipynb':
-        text = convert_notebook(text, convert_url=convert_page_url)
+        # (nbconvert is slow to import; only do it when it's needed)
+        from .notebook import convert_notebook
+        text = convert_notebook(text, convert_url=convert_page_url, cache=cache)
+        with stats.timer('links'):
+            link_collector.scan_html(text)
     else:
         raise ValueError(info['style'])
 
@@ -170,7 +269,7 @@ def render_page(lesson_slug, page_slug, info, path, vars=None):
         page['modules'] = {'katex': '0.7.1'}
 
     # Add links
-    page.update(get_links(text, f'{lesson_slug}/{page_slug}'))
+    page.update(link_collector.as_dict())
     # Check links within page
     for url in page['links']:
         parsed = urlparse(url)
@@ -181,19 +280,3 @@ def render_page(lesson_slug, page_slug, info, path, vars=None):
                 f"{page_slug} of lesson {lesson_slug} links to #{parsed.fragment}, but there is no such `id` in {page['ids']}")
 
     return encode_for_json(page)
-
-def get_links(text, slug):
-    links = set()
-    ids = set()
-    result = {'links': links, 'ids': ids}
-    for fragment in lxml.html.fragments_fromstring(text):
-        for element in chain([fragment], fragment.iterdescendants()):
-            for name in 'href', 'src':
-                link = element.attrib.get(name, None)
-                if link:
-                    links.add(link)
-            id_attr = element.attrib.get('id', None)
-            if id_attr:
-                ids.add(id_attr)
-    return {'links': sorted(links), 'ids': sorted(ids)}
-
@@ -0,0 +1,93 @@
+"""
+Content-addressed store for compiled output
+
+When several courses are compiled with the same store, each page and static
+file is stored once, named by the hash of its content.
+Compiled courses reference these files under `_objects/` in their
+destination directories, which are hard links to the store where possible.
+"""
+
+from pathlib import Path
+import hashlib
+import os
+import shutil
+
+from .cache import hash_file
+from .export import export_file
+
+# Directory in compiled output where stored files are linked
+OBJECTS_DIRNAME = '_objects'
+
+
+class ContentStore:
+    """Directory of files named by the SHA-256 hash of their content
+
+    Files are stored as `<directory>/<xx>/<hash><suffix>`, where `xx` are
+    the first two characters of the hash and `suffix` is the original
+    file extension (so that the files can be served with the right type).
+    """
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} in {self.directory}>'
+
+    def __eq__(self, other):
+        if type(self) != type(other):
+            return NotImplemented
+        return self.directory == other.directory
+
+    def __hash__(self):
+        return hash(self.directory)
+
+    def _name(self, digest, suffix):
+        return Path(digest[:2], digest + suffix)
+
+    def add_bytes(self, content, suffix):
+        """Store the given bytes; return the name relative to the store"""
+        name = self._name(hashlib.sha256(content).hexdigest(), suffix)
+        path = self.directory / name
+        if not path.exists():
+            tmp_path = _temporary_path(path)
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, path)
+        return name
+
+    def add_file(self, source):
+        """Store a copy of the given file; return the name relative to the store
+        """
+        source = Path(source)
+        name = self._name(hash_file(source), source.suffix)
+        path = self.directory / name
+        if not path.exists():
+            tmp_path = _temporary_path(path)
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, path)
+        return name
+
+    def export(self, name, destination):
+        """Make a stored file available in a compiled course directory
+
+        Returns the path of the file in `destination`. It is a hard link
+        to the stored file if possible (e.g. if the store is on the same
+        filesystem), a copy otherwise.
+        """
+        target = destination / OBJECTS_DIRNAME / name
+        if not target.exists():
+            export_file(self.directory / name, target, 'hardlink')
+        return target
+
+
+def _temporary_path(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path.with_name(f'.tmp-{os.getpid()}-{path.name}')
+
+
+def get_content_store(store_dir):
+    """Return a ContentStore for the given directory
+
+    `store_dir` can be a directory, a ContentStore instance or None.
+    """
+    if store_dir is None or isinstance(store_dir, ContentStore):
+        return store_dir
+    return ContentStore(store_dir)
@@ -1,3 +1,6 @@
+import contextlib
+import contextvars
+import os
 import textwrap
 
 import jinja2
@@ -5,7 +8,61 @@ from markupsafe import Markup
 
 from .markdown import convert_markdown
 
-environment = jinja2.Environment(
+# Set of template filenames loaded (or looked for) in the current
+# `record_loaded_templates` block, or None
+_loaded_templates = contextvars.ContextVar('_loaded_templates', default=None)
+
+
+class Environment(jinja2.Environment):
+    """Jinja environment that can record which templates it loads
+
+    This covers `{% extends %}`, `{% include %}` and `{% import %}`,
+    including templates that were looked for but not found
+    (with `ignore missing`, or all but one from a list of names).
+    Creating such a file would change the output.
+    """
+    def _load_template(self, name, globals):
+        loaded = _loaded_templates.get()
+        try:
+            template = super()._load_template(name, globals)
+        except jinja2.TemplateNotFound:
+            if loaded is not None:
+                loaded.update(self._get_template_paths(name))
+            raise
+        if loaded is not None and template.filename:
+            loaded.add(template.filename)
+        return template
+
+    def _get_template_paths(self, name):
+        """Return filenames the loader would read template `name` from"""
+        if not isinstance(self.loader, jinja2.FileSystemLoader):
+            return []
+        try:
+            pieces = jinja2.loaders.split_template_path(name)
+        except jinja2.TemplateNotFound:
+            # Not a valid path (e.g. contains '..')
+            return []
+        return [
+            os.path.join(searchpath, *pieces)
+            for searchpath in self.loader.searchpath
+        ]
+
+
+@contextlib.contextmanager
+def record_loaded_templates():
+    """Collect filenames of all templates loaded in the `with` block
+
+    Filenames of templates that were not found are included.
+    """
+    loaded = set()
+    token = _loaded_templates.set(loaded)
+    try:
+        yield loaded
+    finally:
+        _loaded_templates.reset(token)
+
+
+environment = Environment(
     autoescape=jinja2.select_autoescape('html', 'xml'),
     undefined=jinja2.StrictUndefined,
 )
@@ -0,0 +1,121 @@
+"""
+Re-compile a course whenever its source files change
+
+This keeps a warm process: parsed YAML, Jinja templates, Markdown parsers,
+the notebook exporter and rendered pages stay cached in memory between
+compiles. Pages are only rendered again if a file they read changed
+(see `cache.RenderCache`), and only changed output files are rewritten
+(see `compile(..., incremental=True)`).
+"""
+
+from pathlib import Path
+import os
+import sys
+import time
+import traceback
+
+from .compile import compile
+from .cache import MemoryRenderCache
+
+# Directories (and files) in the repository that hold course sources
+WATCHED_NAMES = 'lessons', 'courses', 'runs', 'course.yml'
+
+
+class Watcher:
+    """Polls source files under `path` for changes
+
+    Changes are detected by comparing each file's modification time and size.
+    """
+    def __init__(self, path, *, names=WATCHED_NAMES):
+        self.path = Path(path)
+        self.names = names
+        self._snapshot = self.snapshot()
+
+    def snapshot(self):
+        """Return a dict of {path: (mtime_ns, size)} for all watched files"""
+        result = {}
+        stack = [self.path / name for name in self.names]
+        while stack:
+            path = stack.pop()
+            try:
+                entries = os.scandir(path)
+            except NotADirectoryError:
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                result[path] = stat.st_mtime_ns, stat.st_size
+                continue
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir():
+                        stack.append(Path(entry.path))
+                    else:
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        result[Path(entry.path)] = (
+                            stat.st_mtime_ns, stat.st_size,
+                        )
+        return result
+
+    def poll(self):
+        """Return a sorted list of files changed since the last poll"""
+        old = self._snapshot
+        new = self._snapshot = self.snapshot()
+        return sorted(
+            path for path in old.keys() | new.keys()
+            if old.get(path) != new.get(path)
+        )
+
+    def wait(self, interval=0.5):
+        """Block until some files change; return a list of them"""
+        while True:
+            changed = self.poll()
+            if changed:
+                return changed
+            time.sleep(interval)
+
+
+def watch(
+    slug=None, *, path='.', destination, edit_info=None, cache_dir=None,
+    interval=0.5, max_compiles=None,
+):
+    """Compile the given course, then re-compile whenever sources change
+
+    Compilation is incremental; see `compile` for the arguments.
+    If `cache_dir` is not given, rendered pages are cached in memory.
+
+    Errors in compilation are reported to stderr; watching continues.
+    `max_compiles` limits the number of compiles (for testing);
+    by default, this runs until interrupted.
+    """
+    path = Path(path)
+    if cache_dir is None:
+        cache_dir = MemoryRenderCache()
+    watcher = Watcher(path)
+    compiles = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            compile(
+                slug, path=path, destination=destination,
+                edit_info=edit_info, cache_dir=cache_dir, incremental=True,
+            )
+        except Exception:
+            traceback.print_exc()
+            print('Compile failed; waiting for changes', file=sys.stderr)
+        else:
+            elapsed = time.perf_counter() - start
+            print(f'Compiled in {elapsed:.2f} s', file=sys.stderr)
+        compiles += 1
+        if max_compiles is not None and compiles >= max_compiles:
+            return
+        changed = watcher.wait(interval)
+        for changed_path in changed:
+            print(f'Changed: {changed_path}', file=sys.stderr)
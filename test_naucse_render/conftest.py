@@ -1,8 +1,12 @@
 import os
+import shutil
 from pathlib import Path
 
+import pytest
 import yaml
 
+import naucse_render.page
+
 
 fixture_path = Path(__file__).parent / 'fixtures'
 
@@ -22,6 +26,26 @@ COURSE_SLUGS_BAD = {
     'courses/bad-serial': TypeError,
 }
 
+@pytest.fixture
+def content_path(tmp_path):
+    """Copy of test_content that tests can modify"""
+    result = tmp_path / 'content'
+    shutil.copytree(fixture_path / 'test_content', result)
+    return result
+
+
+@pytest.fixture
+def render_log(monkeypatch):
+    """List of (lesson_slug, page_slug) of pages that are actually rendered"""
+    log = []
+    orig = naucse_render.page._render_page
+    def _render_page(lesson_slug, page_slug, *args, **kwargs):
+        log.append((lesson_slug, page_slug))
+        return orig(lesson_slug, page_slug, *args, **kwargs)
+    monkeypatch.setattr(naucse_render.page, '_render_page', _render_page)
+    return log
+
+
 def assert_yaml_dump(data, filename):
     """Assert that JSON-compatible "data" matches a given YAML dump
 
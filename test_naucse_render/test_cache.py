@@ -0,0 +1,146 @@
+import shutil
+
+import pygments
+import pytest
+
+import naucse_render
+from naucse_render.cache import get_versions, get_source_hash
+from naucse_render.markdown import highlight_code
+from naucse_render.page import get_lessons_environment
+
+
+SLUGS = ['beginners/install-editor', 'homework/tasks']
+
+
+def test_cache_reused(content_path, tmp_path, render_log):
+    cache_dir = tmp_path / 'cache'
+    first = naucse_render.get_lessons(
+        SLUGS, path=content_path, cache_dir=cache_dir,
+    )
+    assert len(render_log) == 4
+    render_log.clear()
+
+    second = naucse_render.get_lessons(
+        SLUGS, path=content_path, cache_dir=cache_dir,
+    )
+    assert render_log == []
+    assert second == first
+    assert second == naucse_render.get_lessons(SLUGS, path=content_path)
+
+
+def test_cache_template_change(content_path, tmp_path, render_log):
+    """Changing an extended template invalidates the pages that use it"""
+    cache_dir = tmp_path / 'cache'
+    naucse_render.get_lessons(SLUGS, path=content_path, cache_dir=cache_dir)
+    render_log.clear()
+
+    base_path = content_path / 'lessons/beginners/install-editor/_base.md'
+    base_path.write_text(base_path.read_text() + '\nEXTRA TEXT\n')
+    result = naucse_render.get_lessons(
+        SLUGS, path=content_path, cache_dir=cache_dir,
+    )
+    assert render_log == [
+        ('beginners/install-editor', 'atom'),
+        ('beginners/install-editor', 'gedit'),
+    ]
+    pages = result['data']['beginners/install-editor']['pages']
+    assert 'EXTRA TEXT' in pages['gedit']['content']
+
+
+def test_cache_data_change(content_path, tmp_path, render_log):
+    """Changing `data` YAML invalidates the page"""
+    cache_dir = tmp_path / 'cache'
+    naucse_render.get_lessons(SLUGS, path=content_path, cache_dir=cache_dir)
+    render_log.clear()
+
+    data_path = content_path / 'lessons/homework/tasks/tasks.yml'
+    data_path.write_text(data_path.read_text().replace('A task', 'XYZZY task', 1))
+    result = naucse_render.get_lessons(
+        SLUGS, path=content_path, cache_dir=cache_dir,
+    )
+    assert render_log == [('homework/tasks', 'index')]
+    assert 'XYZZY' in result['data']['homework/tasks']['pages']['index']['content']
+
+
+@pytest.mark.parametrize('include', (
+    "{% include 'beginners/install-editor/_extra.md' ignore missing %}",
+    "{% include ['beginners/install-editor/_extra.md', "
+    + "'beginners/install-editor/_fallback.md'] %}",
+))
+def test_cache_missing_template_created(
+    content_path, tmp_path, render_log, include,
+):
+    """Creating a template that wasn't found invalidates the page"""
+    cache_dir = tmp_path / 'cache'
+    lesson_path = content_path / 'lessons/beginners/install-editor'
+    (lesson_path / '_fallback.md').write_text('FALLBACK TEXT\n')
+    index_path = lesson_path / 'index.md'
+    index_path.write_text(index_path.read_text() + '\n' + include + '\n')
+    result = naucse_render.get_lessons(
+        SLUGS, path=content_path, cache_dir=cache_dir,
+    )
+    pages = result['data']['beginners/install-editor']['pages']
+    assert 'EXTRA TEXT' not in pages['index']['content']
+    render_log.clear()
+
+    (lesson_path / '_extra.md').write_text('EXTRA TEXT\n')
+    result = naucse_render.get_lessons(
+        SLUGS, path=content_path, cache_dir=cache_dir,
+    )
+    assert render_log == [('beginners/install-editor', 'index')]
+    pages = result['data']['beginners/install-editor']['pages']
+    assert 'EXTRA TEXT' in pages['index']['content']
+
+
+def test_versions_include_source_hash():
+    versions = get_versions()
+    assert versions['naucse_render source'] == get_source_hash()
+    assert len(get_source_hash()) == 64
+
+
+def test_cache_vars_change(content_path, tmp_path, render_log):
+    """Different vars give different cache entries"""
+    cache_dir = tmp_path / 'cache'
+    naucse_render.get_lessons(SLUGS, path=content_path, cache_dir=cache_dir)
+    render_log.clear()
+
+    naucse_render.get_lessons(
+        SLUGS, path=content_path, cache_dir=cache_dir,
+        vars={'user-gender': 'f'},
+    )
+    assert len(render_log) == 4
+
+
+def test_highlight_cache(content_path, tmp_path, monkeypatch):
+    """Highlighted code is stored on disk and reused by later runs"""
+    cache_dir = tmp_path / 'cache'
+    first = naucse_render.get_lessons(
+        SLUGS, path=content_path, cache_dir=cache_dir,
+    )
+    assert list((cache_dir / 'highlight').glob('*/*.html'))
+
+    # Remove cached pages (but not code), and the in-memory cache
+    shutil.rmtree(cache_dir / 'pages')
+    highlight_code.cache_clear()
+
+    def fail(*args, **kwargs):
+        raise AssertionError('pygments.highlight should not be called')
+    monkeypatch.setattr(pygments, 'highlight', fail)
+
+    second = naucse_render.get_lessons(
+        SLUGS, path=content_path, cache_dir=cache_dir,
+    )
+    assert second == first
+
+
+def test_jinja_bytecode_cache(content_path, tmp_path):
+    """Compiled templates are stored in the cache directory"""
+    cache_dir = tmp_path / 'cache'
+    naucse_render.get_lessons(SLUGS, path=content_path, cache_dir=cache_dir)
+    assert list((cache_dir / 'jinja').iterdir())
+
+
+def test_lessons_environment_shared(content_path):
+    lessons_path = content_path / 'lessons'
+    env = get_lessons_environment(lessons_path)
+    assert get_lessons_environment(lessons_path) is env
@@ -1,10 +1,13 @@
 import json
+import os
 import shutil
 
 import yaml
 import pytest
 
 import naucse_render
+from naucse_render.compile import BrokenLinksError, CourseWriter
+from naucse_render.compile import get_lesson_slugs
 
 from test_naucse_render.conftest import fixture_path
 
@@ -88,6 +91,83 @@ def test_destination_regular_file(tmp_path):
 ))
 def test_bad_link(tmp_path, bad_link, expected_msg):
     """A bad link raises"""
+    path = make_content_with_links(tmp_path, [bad_link])
+    destination = tmp_path / 'dest'
+    with pytest.raises((KeyError, ValueError), match=expected_msg):
+        naucse_render.compile(path=path, destination=destination)
+    # No partial output is left behind
+    assert not destination.exists()
+
+
+COURSE_BAD_LINKS = (
+    '{{lesson_url("nowhere")}}',
+    '{{lesson_url("testcases/bad_link", page="bad_subpage")}}',
+    '{{static("bad.png")}}',
+    '{{lesson_url("beginners/install-editor")}}#bad_id',
+)
+
+
+def test_all_bad_links_reported(tmp_path):
+    path = make_content_with_links(tmp_path, [
+        *COURSE_BAD_LINKS, '{{lesson_url("beginners/install-editor")}}',
+    ])
+    with pytest.raises(BrokenLinksError) as excinfo:
+        naucse_render.compile(path=path, destination=tmp_path / 'dest')
+    problems = excinfo.value.problems
+    assert len(problems) == len(COURSE_BAD_LINKS)
+    assert {p.lesson_slug for p in problems} == {'testcases/bad_link'}
+    for problem in problems:
+        assert problem.message in str(excinfo.value)
+    assert 'bad.png' in str(excinfo.value)
+    assert 'extra_lessons' in str(excinfo.value)
+
+
+def test_check_links(tmp_path):
+    path = make_content_with_links(tmp_path, COURSE_BAD_LINKS)
+    problems = naucse_render.check_links(path=path)
+    assert len(problems) == len(COURSE_BAD_LINKS)
+    assert [p.page_slug for p in problems] == ['index'] * len(problems)
+    assert sorted(p.link for p in problems) == [
+        'naucse:page?lesson=beginners/install-editor#bad_id',
+        'naucse:page?lesson=nowhere',
+        'naucse:page?lesson=testcases/bad_link&page=bad_subpage',
+        'naucse:static?filename=bad.png',
+    ]
+    # Nothing is written
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['content']
+
+
+def test_check_links_good():
+    path = fixture_path / 'test_content'
+    assert naucse_render.check_links('lessons', path=path) == []
+
+
+def test_course_writer_keeps_only_link_info(tmp_path):
+    """Added lessons aren't held in memory, except for what links need"""
+    path = fixture_path / 'test_content'
+    naucse_render.compile('lessons', path=path, destination=tmp_path / 'a')
+
+    info = naucse_render.get_course('lessons', path=path)
+    slugs = get_lesson_slugs(info['course'])
+    writer = CourseWriter(info, tmp_path / 'b', path)
+    dependencies = {}
+    for slug, lesson in naucse_render.iter_lessons(
+        slugs, path=path, dependencies=dependencies,
+    ):
+        writer.add_lesson(slug, lesson, dependencies[slug])
+    for lesson_info in writer.link_info.values():
+        assert set(lesson_info) == {'pages', 'static_files'}
+        for page_info in lesson_info['pages'].values():
+            assert set(page_info) == {'links', 'ids'}
+    writer.write()
+
+    expected = (tmp_path / 'a' / 'course.json').read_bytes()
+    assert (tmp_path / 'b' / 'course.json').read_bytes() == expected
+
+
+def make_content_with_links(tmp_path, links):
+    """Make a copy of test_content whose default course has the given links
+    """
     path = tmp_path / 'content'
     shutil.copytree(fixture_path / 'test_content', path)
     with open(path / 'course.yml', 'w') as f:
@@ -110,7 +190,105 @@ def test_bad_link(tmp_path, bad_link, expected_msg):
             'license': 'cc0',
         }, f)
     with open(lesson_path / 'index.md', 'w') as f:
-        print(f'<a href="{bad_link}">Bad link</a>', file=f)
+        for link in links:
+            print(f'<a href="{link}">Link</a>', file=f)
+    return path
+
+
+def test_incremental_unchanged(tmp_path):
+    """Incremental compile doesn't rewrite files that didn't change"""
+    path = fixture_path / 'test_content'
+    naucse_render.compile(path=path, destination=tmp_path)
+    files = [p for p in tmp_path.glob('**/*') if p.is_file()]
+    for file in files:
+        os.utime(file, ns=(0, 0))
+    naucse_render.compile(path=path, destination=tmp_path, incremental=True)
+    assert sorted(p for p in tmp_path.glob('**/*') if p.is_file()) == sorted(files)
+    for file in files:
+        assert file.stat().st_mtime_ns == 0
+
+
+def test_incremental_keeps_names_and_removes_orphans(tmp_path):
+    """Incremental compile keeps previous filenames and removes other files"""
+    path = fixture_path / 'test_content'
     destination = tmp_path / 'dest'
-    with pytest.raises((KeyError, ValueError), match=expected_msg):
-        naucse_render.compile(path=path, destination=destination)
+    naucse_render.compile(path=path, destination=destination)
+
+    # Rename a page's file (as if it was chosen by an earlier compile)
+    info_path = destination / 'course.json'
+    info = json.loads(info_path.read_text())
+    page = info['course']['lessons']['beginners/install-editor']['pages']['atom']
+    old_path = destination / page['content']['path']
+    (destination / 'renamed').mkdir()
+    old_path.rename(destination / 'renamed/atom.html')
+    page['content']['path'] = 'renamed/atom.html'
+    info_path.write_text(json.dumps(info))
+
+    (destination / 'orphan.txt').write_text('not from compile')
+    (destination / 'orphan_dir').mkdir()
+    (destination / 'orphan_dir/orphan.txt').write_text('not from compile')
+
+    naucse_render.compile(path=path, destination=destination, incremental=True)
+    info = json.loads(info_path.read_text())
+    page = info['course']['lessons']['beginners/install-editor']['pages']['atom']
+    assert page['content']['path'] == 'renamed/atom.html'
+    assert (destination / 'renamed/atom.html').exists()
+    assert not old_path.exists()
+    assert not (destination / 'orphan.txt').exists()
+    assert not (destination / 'orphan_dir').exists()
+
+    # The result has the same content as a full compile
+    full = tmp_path / 'full'
+    naucse_render.compile(path=path, destination=full)
+    full_info = json.loads((full / 'course.json').read_text())
+    for lesson_slug, lesson in info['course']['lessons'].items():
+        full_lesson = full_info['course']['lessons'][lesson_slug]
+        for page_slug, page in lesson['pages'].items():
+            full_page = full_lesson['pages'][page_slug]
+            assert (
+                (destination / page['content']['path']).read_bytes()
+                == (full / full_page['content']['path']).read_bytes()
+            )
+
+
+def test_incremental_into_bad_previous_info(tmp_path):
+    """Incremental compile over a broken `course.json` does a full compile"""
+    path = fixture_path / 'test_content'
+    (tmp_path / 'course.json').write_text('test')
+    (tmp_path / 'other_file').write_text('test')
+    naucse_render.compile(path=path, destination=tmp_path, incremental=True)
+    assert json.loads((tmp_path / 'course.json').read_text())
+    assert not (tmp_path / 'other_file').exists()
+
+
+def read_tree(path):
+    """Return {relative path: content} of all files in a directory"""
+    return {
+        p.relative_to(path).as_posix(): p.read_bytes()
+        for p in sorted(path.glob('**/*')) if p.is_file()
+    }
+
+
+@pytest.mark.parametrize('incremental', (False, True))
+@pytest.mark.parametrize('breakage', (
+    '{{ undefined_variable.attribute }}',
+    '<a href="{{ static("bad.png") }}">Bad link</a>',
+))
+def test_failed_compile_keeps_previous_output(tmp_path, incremental, breakage):
+    """If compiling fails, output of the previous compile stays intact"""
+    path = tmp_path / 'content'
+    shutil.copytree(fixture_path / 'test_content', path)
+    destination = tmp_path / 'dest'
+    naucse_render.compile(path=path, destination=destination)
+    before = read_tree(destination)
+
+    with open(path / 'lessons/beginners/install-editor/index.md', 'a') as f:
+        print('\nNew paragraph', file=f)
+        print(breakage, file=f)
+    with pytest.raises(Exception):
+        naucse_render.compile(
+            path=path, destination=destination, incremental=incremental,
+        )
+    assert read_tree(destination) == before
+    # No staging output is left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['content', 'dest']
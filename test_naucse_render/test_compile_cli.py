@@ -4,6 +4,7 @@ import shutil
 import pytest
 from click.testing import CliRunner
 
+import naucse_render
 from naucse_render.cli import main
 
 from test_naucse_render.conftest import fixture_path
@@ -157,3 +158,81 @@ def test_cli_nodefault_all(tmp_path, nodefault_path):
     assert sorted(p.name for p in (tmp_path / 'out').iterdir()) == [
         '2000', 'extra-lessons', 'flat', 'normal-course', 'serial-test',
     ]
+
+
+def test_cli_jobs(tmp_path):
+    """--jobs works"""
+    path = fixture_path / 'test_content'
+    runner = CliRunner()
+    result = runner.invoke(main, [
+        "compile", '--path', path, str(tmp_path / 'out'),
+        '--slug', 'flat', '--jobs', '2',
+    ])
+    assert result.exit_code == 0
+    with open(tmp_path / 'out/course.json') as f:
+        data = json.load(f)
+    assert data['course']['title'] == 'A plain vanilla course'
+
+
+def test_cli_get_lessons():
+    """get-lessons prints the same data as get_lessons()"""
+    path = fixture_path / 'test_content'
+    slugs = ['homework/tasks', 'beginners/install-editor', 'nonexistent/x']
+    try:
+        runner = CliRunner(mix_stderr=False)
+    except TypeError:
+        # Click 8.2+ always keeps stderr separate
+        runner = CliRunner()
+    result = runner.invoke(main, ['get-lessons', '--path', path, *slugs])
+    assert result.exit_code == 0
+    expected = naucse_render.get_lessons(slugs, path=path)
+    assert result.stdout == json.dumps(expected, indent=4, ensure_ascii=False) + '\n'
+
+
+def test_cli_get_lessons_duplicates():
+    path = fixture_path / 'test_content'
+    try:
+        runner = CliRunner(mix_stderr=False)
+    except TypeError:
+        # Click 8.2+ always keeps stderr separate
+        runner = CliRunner()
+    result = runner.invoke(main, [
+        'get-lessons', '--path', path, 'homework/tasks', 'homework/tasks',
+    ])
+    assert result.exit_code == 0
+    assert result.stdout.count('"homework/tasks"') == 1
+    assert json.loads(result.stdout) == naucse_render.get_lessons(
+        ['homework/tasks'], path=path,
+    )
+
+
+def test_cli_get_lessons_failure(tmp_path):
+    path = tmp_path / 'content'
+    shutil.copytree(fixture_path / 'test_content', path)
+    (path / 'lessons/homework/tasks/index.md').write_text('{{ undefined }}')
+    runner = CliRunner()
+    result = runner.invoke(main, [
+        'get-lessons', '--path', path, 'beginners/install-editor',
+        'homework/tasks',
+    ])
+    assert result.exit_code != 0
+
+
+def test_cli_check_links():
+    path = fixture_path / 'test_content'
+    runner = CliRunner()
+    result = runner.invoke(main, ['check-links', '--path', path])
+    assert result.exit_code == 0
+
+
+def test_cli_check_links_bad(tmp_path):
+    path = tmp_path / 'content'
+    shutil.copytree(fixture_path / 'test_content', path)
+    with open(path / 'lessons/beginners/install-editor/index.md', 'a') as f:
+        print('[a]({{ static("bad.png") }}) [b](../../nowhere/lesson/)', file=f)
+    runner = CliRunner()
+    result = runner.invoke(main, ['check-links', '--path', path])
+    assert result.exit_code == 1
+    assert 'beginners/install-editor (index): ' in result.output
+    assert 'missing static file bad.png' in result.output
+    assert 'links to lesson nowhere/lesson' in result.output
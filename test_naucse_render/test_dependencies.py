@@ -0,0 +1,117 @@
+import json
+
+from click.testing import CliRunner
+
+import naucse_render
+from naucse_render.cli import main
+from naucse_render.dependencies import read_dependency_graph, get_affected
+from naucse_render.dependencies import matches_pattern
+
+from test_naucse_render.conftest import fixture_path
+
+
+def compile_lessons(destination, **kwargs):
+    naucse_render.compile(
+        'lessons', path=fixture_path / 'test_content',
+        destination=destination, **kwargs,
+    )
+    return read_dependency_graph(destination)
+
+
+def test_page_dependencies(tmp_path):
+    graph = compile_lessons(tmp_path)
+    assert graph['lessons']['beginners/install-editor']['gedit'] == [
+        'lessons/beginners/install-editor/_base.md',
+        'lessons/beginners/install-editor/_linux_base.md',
+        'lessons/beginners/install-editor/gedit.md',
+        'lessons/beginners/install-editor/info.yml',
+        'lessons/beginners/install-editor/static/gedit_linenums.png',
+    ]
+    # Data YAML
+    assert 'lessons/homework/tasks/tasks.yml' in (
+        graph['lessons']['homework/tasks']['index']
+    )
+
+
+def test_course_dependencies(tmp_path):
+    naucse_render.compile(
+        'courses/normal-course', path=fixture_path / 'test_content',
+        destination=tmp_path,
+    )
+    graph = read_dependency_graph(tmp_path)
+    assert graph['course'] == [
+        # (looked for first)
+        'courses/normal-course.yml',
+        'courses/normal-course/info.yml',
+    ]
+    assert graph['course_patterns'] == []
+
+
+def test_course_dependencies_material_titles(tmp_path):
+    """Lesson info that material titles are taken from affects the course"""
+    naucse_render.compile(
+        'courses/extra-lessons', path=fixture_path / 'test_content',
+        destination=tmp_path,
+    )
+    graph = read_dependency_graph(tmp_path)
+    assert 'lessons/duplicate/install-editor/info.yml' in graph['course']
+    assert get_affected(graph, [
+        'lessons/duplicate/install-editor/info.yml',
+    ])['course']
+
+
+def test_lessons_course_affected_by_new_lessons(tmp_path):
+    graph = compile_lessons(tmp_path)
+    assert get_affected(graph, ['lessons/new/lesson/info.yml'])['course']
+    assert get_affected(graph, ['lessons/homework/tasks/info.yml'])['course']
+    for path in 'lessons/new/lesson/index.md', 'lessons/new/info.yml':
+        assert not get_affected(graph, [path])['course']
+
+
+def test_matches_pattern():
+    assert matches_pattern('lessons/a/b/info.yml', 'lessons/*/*/info.yml')
+    assert not matches_pattern('lessons/a/info.yml', 'lessons/*/*/info.yml')
+    assert not matches_pattern(
+        'lessons/a/b/c/info.yml', 'lessons/*/*/info.yml',
+    )
+    assert not matches_pattern('x/lessons/a/b/info.yml', 'lessons/*/*/info.yml')
+
+
+def test_dependencies_same_with_cache(tmp_path):
+    """Pages taken from the cache have the same dependencies"""
+    cache_dir = tmp_path / 'cache'
+    first = compile_lessons(tmp_path / 'first', cache_dir=cache_dir)
+    second = compile_lessons(tmp_path / 'second', cache_dir=cache_dir)
+    assert second == first
+    third = compile_lessons(tmp_path / 'third', jobs=2)
+    assert third == first
+
+
+def test_get_affected(tmp_path):
+    graph = compile_lessons(tmp_path)
+    assert get_affected(graph, [
+        'lessons/beginners/install-editor/_base.md',
+        'lessons/homework/tasks/tasks.yml',
+        'README.md',
+    ]) == {
+        'course': False,
+        'lessons': {
+            'beginners/install-editor': ['atom', 'gedit'],
+            'homework/tasks': ['index'],
+        },
+    }
+    assert get_affected(graph, []) == {'course': False, 'lessons': {}}
+
+
+def test_cli_affected(tmp_path):
+    compile_lessons(tmp_path)
+    runner = CliRunner()
+    result = runner.invoke(main, [
+        'affected', str(tmp_path),
+        'lessons/testcases/test_static_tree/static/directory/smile.png',
+    ])
+    assert result.exit_code == 0
+    assert json.loads(result.output) == {
+        'course': False,
+        'lessons': {'testcases/test_static_tree': ['index']},
+    }
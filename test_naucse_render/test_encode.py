@@ -1,10 +1,11 @@
 from pathlib import Path, PurePosixPath, PureWindowsPath
 import datetime
+import json
 
 import pytest
 from markupsafe import Markup
 
-from naucse_render.encode import encode_for_json
+from naucse_render.encode import encode_for_json, iterencode_streamed
 
 
 @pytest.mark.parametrize('thing', (
@@ -33,3 +34,38 @@ def test_encode_identity(input, expected_type, expected):
     result = encode_for_json(input)
     assert type(result) == expected_type
     assert result == expected
+
+
+@pytest.mark.parametrize('items', (
+    [],
+    [('a', 1)],
+    [('a', {'x': [1, 2, {}], 'y': 'text\nwith "newline"'}), ('b', {}), ('č', [])],
+))
+@pytest.mark.parametrize('key_path', (
+    ('data',),
+    ('course', 'lessons'),
+))
+@pytest.mark.parametrize('dump_args', (
+    {'indent': 4},
+    {'indent': 4, 'sort_keys': True, 'ensure_ascii': False},
+    {'indent': 2},
+))
+def test_iterencode_streamed(items, key_path, dump_args):
+    value = {'z': 'last', 'course': {'title': 'Č', 'x': []}, 'a': 1}
+    expected_value = json.loads(json.dumps(value))
+    container = expected_value
+    for key in key_path[:-1]:
+        container = container.setdefault(key, {})
+    container[key_path[-1]] = dict(items)
+
+    result = ''.join(iterencode_streamed(
+        value, key_path, iter(items), **dump_args,
+    ))
+    assert result == json.dumps(expected_value, **dump_args)
+
+
+def test_iterencode_streamed_unsorted():
+    with pytest.raises(ValueError):
+        ''.join(iterencode_streamed(
+            {}, ['data'], [('b', 1), ('a', 2)], indent=4, sort_keys=True,
+        ))
@@ -0,0 +1,92 @@
+from pathlib import Path
+import json
+import os
+
+import pytest
+
+import naucse_render
+from naucse_render.export import export_file, export_if_changed, STRATEGIES
+
+from test_naucse_render.conftest import fixture_path
+
+
+def get_static_paths(destination):
+    """Yield (source, exported) paths of static files in a compiled course"""
+    info = json.loads((destination / 'course.json').read_text())
+    for lesson_slug, lesson in info['course']['lessons'].items():
+        for filename, static_file in lesson['static_files'].items():
+            source = (
+                fixture_path / 'test_content/lessons' / lesson_slug
+                / 'static' / filename
+            )
+            yield source, destination / static_file['path']
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_compile_static_export(tmp_path, strategy, monkeypatch):
+    # Static files are not read into memory
+    orig_read_bytes = Path.read_bytes
+    def read_bytes(self):
+        assert 'static' not in self.parts
+        return orig_read_bytes(self)
+    monkeypatch.setattr(Path, 'read_bytes', read_bytes)
+
+    naucse_render.compile(
+        'lessons', path=fixture_path / 'test_content', destination=tmp_path,
+        static_export=strategy,
+    )
+    monkeypatch.undo()
+    static_paths = list(get_static_paths(tmp_path))
+    assert static_paths
+    for source, exported in static_paths:
+        assert exported.read_bytes() == source.read_bytes()
+        assert exported.is_symlink() == (strategy == 'symlink')
+        assert os.path.samefile(source, exported) == (
+            strategy in ('hardlink', 'symlink')
+        )
+
+
+def test_incremental_strategy_change(tmp_path):
+    """Changing the strategy in an incremental compile replaces the files"""
+    path = fixture_path / 'test_content'
+    naucse_render.compile(
+        'lessons', path=path, destination=tmp_path, static_export='hardlink',
+    )
+    naucse_render.compile(
+        'lessons', path=path, destination=tmp_path, static_export='copy',
+        incremental=True,
+    )
+    for source, exported in get_static_paths(tmp_path):
+        assert not os.path.samefile(source, exported)
+        assert exported.read_bytes() == source.read_bytes()
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_export_if_changed(tmp_path, strategy):
+    source = tmp_path / 'source.txt'
+    source.write_text('original')
+    target = tmp_path / 'out/target.txt'
+    export_if_changed(source, target, strategy)
+    assert target.read_text() == 'original'
+    stat = target.lstat()
+
+    # Up-to-date file is left alone
+    export_if_changed(source, target, strategy)
+    assert target.lstat().st_ino == stat.st_ino
+
+    # Outdated copy is replaced (not overwritten)
+    other = tmp_path / 'other.txt'
+    other.write_text('other')
+    target.unlink()
+    export_file(other, target, 'hardlink')
+    export_if_changed(source, target, strategy)
+    assert target.read_text() == 'original'
+    assert other.read_text() == 'other'
+
+
+def test_unknown_strategy(tmp_path):
+    with pytest.raises(ValueError):
+        naucse_render.compile(
+            'lessons', path=fixture_path / 'test_content',
+            destination=tmp_path, static_export='teleport',
+        )
@@ -0,0 +1,61 @@
+"""Commands that don't render pages shouldn't import rendering libraries"""
+
+import subprocess
+import sys
+
+import pytest
+
+from test_naucse_render.conftest import fixture_path
+
+HEAVY_MODULES = (
+    'nbconvert', 'nbformat', 'traitlets', 'lxml', 'pygments', 'ansi2html',
+    'jinja2',
+)
+
+SCRIPT = '''
+import sys
+from naucse_render.cli import main
+try:
+    main(sys.argv[1:])
+except SystemExit as e:
+    assert not e.code
+print(' '.join(sorted(sys.modules)), file=sys.stderr)
+'''
+
+
+def get_imported_modules(*args):
+    result = subprocess.run(
+        [sys.executable, '-c', SCRIPT, *args],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        encoding='utf-8',
+    )
+    return set(result.stderr.splitlines()[-1].split())
+
+
+@pytest.mark.parametrize('args', (
+    ['ls'],
+    ['get-course'],
+    ['get-course', 'courses/normal-course'],
+    ['get-course', 'lessons'],
+))
+def test_no_heavy_imports(args):
+    modules = get_imported_modules(
+        *args, '--path', str(fixture_path / 'test_content'),
+    )
+    imported = {name.split('.')[0] for name in modules}
+    assert imported.isdisjoint(HEAVY_MODULES)
+
+
+def test_get_lessons_imports_rendering():
+    # Sanity check for the test above
+    modules = get_imported_modules(
+        'get-lessons', 'beginners/install-editor',
+        '--path', str(fixture_path / 'test_content'),
+    )
+    assert {'jinja2', 'pygments'} <= {name.split('.')[0] for name in modules}
+
+
+def test_lexer_reexported_from_markdown():
+    from naucse_render.markdown import MSDOSSessionVenvLexer
+    from naucse_render.lexers import MSDOSSessionVenvLexer as lexer_class
+    assert MSDOSSessionVenvLexer is lexer_class
@@ -0,0 +1,210 @@
+import json
+
+from click.testing import CliRunner
+import pytest
+
+import naucse_render
+from naucse_render.cli import main
+from naucse_render.instrument import (
+    Stats, stats, add_listener, remove_listener,
+    start_trace, stop_trace, get_trace,
+    start_profile, stop_profile, get_profile,
+)
+from naucse_render.load import yaml_cache
+
+from test_naucse_render.conftest import fixture_path
+
+PATH = fixture_path / 'test_content'
+SLUGS = ['beginners/install-editor', 'homework/tasks']
+
+
+@pytest.fixture
+def events():
+    result = []
+    def listener(event, data):
+        result.append((event, data))
+    add_listener(listener)
+    yield result
+    remove_listener(listener)
+
+
+def test_events(events):
+    yaml_cache.clear()
+    naucse_render.get_lessons(SLUGS, path=PATH)
+    rendered = [
+        (data['lesson_slug'], data['page_slug'])
+        for event, data in events if event == 'render_page'
+    ]
+    assert sorted(rendered) == [
+        ('beginners/install-editor', 'atom'),
+        ('beginners/install-editor', 'gedit'),
+        ('beginners/install-editor', 'index'),
+        ('homework/tasks', 'index'),
+    ]
+    loaded = [data['path'] for event, data in events if event == 'load_yaml']
+    assert PATH / 'lessons/homework/tasks/tasks.yml' in loaded
+
+
+@pytest.mark.parametrize('jobs', (1, 2))
+def test_stats(jobs):
+    stats.reset()
+    naucse_render.get_lessons(SLUGS, path=PATH, jobs=jobs)
+    # With jobs=2, stats from worker processes are merged
+    assert stats.counts['render_page'] == 4
+    assert stats.counts['jinja'] == 4
+    assert stats.counts['markdown'] >= 4
+    assert stats.times['render_page'] > 0
+
+
+def test_stats_merge_and_format():
+    first = Stats()
+    first.count('things', 2)
+    with first.timer('markdown'):
+        pass
+    second = Stats()
+    second.merge(first.as_dict())
+    second.merge(first.as_dict())
+    assert second.counts == {'things': 4, 'markdown': 2}
+    lines = second.format().splitlines()
+    assert lines[0].split() == ['Stage', 'Count', 'Time', '(s)']
+    assert lines[1].split()[:2] == ['markdown', '2']
+    assert lines[2].split() == ['things', '4']
+
+
+def test_cli_stats(tmp_path):
+    runner = CliRunner()
+    result = runner.invoke(main, [
+        'compile', '--path', PATH, '--slug', 'lessons', '--stats',
+        str(tmp_path / 'out'),
+    ])
+    assert result.exit_code == 0
+    for stage in 'render_page', 'jinja', 'markdown', 'externalize':
+        assert f'\n{stage} ' in result.output
+
+
+def spans(trace_data, name):
+    return [e for e in trace_data['traceEvents'] if e['name'] == name]
+
+
+def contains(outer, inner):
+    return (
+        outer['pid'] == inner['pid']
+        and outer['ts'] <= inner['ts']
+        and inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur']
+    )
+
+
+@pytest.mark.parametrize('jobs', (1, 2))
+def test_cli_trace(tmp_path, jobs):
+    trace_path = tmp_path / 'trace.json'
+    runner = CliRunner()
+    result = runner.invoke(main, [
+        'compile', '--path', PATH, '--slug', 'lessons', '--jobs', jobs,
+        '--trace', trace_path, str(tmp_path / 'out'),
+    ])
+    assert result.exit_code == 0
+    assert get_trace() is None
+    trace_data = json.loads(trace_path.read_text())
+    assert trace_data['traceEvents'][0]['ph'] == 'M'
+
+    [course] = spans(trace_data, 'course')
+    assert course['args'] == {'slug': 'lessons'}
+    assert spans(trace_data, 'static_file')
+    for span in spans(trace_data, 'externalize'):
+        assert contains(course, span)
+
+    pages = spans(trace_data, 'render_page')
+    assert len(pages) == len(spans(trace_data, 'jinja'))
+    for jinja in spans(trace_data, 'jinja'):
+        assert any(contains(page, jinja) for page in pages)
+    for page in pages:
+        assert any(
+            contains(lesson, page) for lesson in spans(trace_data, 'lesson')
+        )
+    pids = {span['pid'] for span in pages}
+    if jobs == 1:
+        assert pids == {course['pid']}
+    else:
+        assert course['pid'] not in pids
+
+
+def test_compile_many_trace(tmp_path):
+    """All of compile_many (including rendering lessons) is in one span"""
+    destinations = {
+        'lessons': tmp_path / 'lessons',
+        'courses/normal-course': tmp_path / 'normal-course',
+    }
+    trace = start_trace()
+    try:
+        naucse_render.compile_many(destinations, path=PATH)
+    finally:
+        stop_trace()
+    trace_data = trace.as_dict()
+
+    [compile_many] = spans(trace_data, 'compile_many')
+    assert compile_many['args'] == {'slugs': list(destinations)}
+    courses = spans(trace_data, 'course')
+    assert sorted(c['args']['slug'] for c in courses) == sorted(destinations)
+    lessons = spans(trace_data, 'lesson')
+    assert lessons
+    for span in courses + lessons:
+        assert contains(compile_many, span)
+
+
+def test_trace_not_recorded_by_default():
+    assert get_trace() is None
+    naucse_render.get_lessons(SLUGS, path=PATH)
+    trace = start_trace()
+    try:
+        naucse_render.get_lessons(SLUGS, path=PATH)
+    finally:
+        assert stop_trace() is trace
+    assert len(spans(trace.as_dict(), 'render_page')) == 4
+
+
+@pytest.mark.parametrize('jobs', (1, 2))
+def test_profile_pages(jobs):
+    profile = start_profile()
+    try:
+        naucse_render.get_lessons(SLUGS, path=PATH, jobs=jobs)
+    finally:
+        assert stop_profile() is profile
+    assert get_profile() is None
+    pages = {(p.lesson_slug, p.page_slug): p for p in profile.pages}
+    assert sorted(pages) == [
+        ('beginners/install-editor', 'atom'),
+        ('beginners/install-editor', 'gedit'),
+        ('beginners/install-editor', 'index'),
+        ('homework/tasks', 'index'),
+    ]
+    index = pages['beginners/install-editor', 'index']
+    assert index.wall_time > 0
+    assert index.peak_memory > 0
+    assert index.html_size > 0
+    assert index.code_blocks > 0
+    assert index.solutions == 1
+
+    ranked = profile.ranked('html_size')
+    assert [p.html_size for p in ranked] == sorted(
+        (p.html_size for p in profile.pages), reverse=True,
+    )
+
+
+def test_cli_profile_pages(tmp_path):
+    output_path = tmp_path / 'profile.json'
+    runner = CliRunner()
+    result = runner.invoke(main, [
+        'compile', '--path', PATH, '--slug', 'lessons',
+        '--profile-pages', '2', '--profile-sort', 'solutions',
+        '--profile-output', output_path, str(tmp_path / 'out'),
+    ])
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    header_index = [l.split()[0] for l in lines].index('Page')
+    report = lines[header_index + 1:]
+    assert len(report) == 2
+    assert report[0].startswith('beginners/install-editor (index) ')
+
+    profiles = json.loads(output_path.read_text())
+    assert len(profiles) > 2
+    assert profiles[0]['solutions'] == 1
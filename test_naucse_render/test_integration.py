@@ -83,6 +83,94 @@ def test_compile_course(slug, tmp_path):
             raise AssertionError('Expected output missing; set TEST_NAUCSE_DUMP_YAML=1')
 
 
+@pytest.mark.parametrize('slug', ('courses/normal-course', 'lessons'))
+def test_compile_course_parallel(slug, tmp_path):
+    """Rendering in worker processes gives the same output"""
+    path = fixture_path / 'test_content'
+    naucse_render.compile(
+        slug, path=str(path), destination=tmp_path, jobs=2,
+    )
+    assert_dirs_same(tmp_path, fixture_path / 'expected-compiled' / slug)
+
+
+@pytest.mark.parametrize('jobs', (1, 2))
+def test_compile_many(tmp_path, render_log, jobs):
+    """compile_many gives the same output as compile, rendering less"""
+    path = fixture_path / 'test_content'
+
+    slugs = None, 'courses/extra-lessons', 'lessons', 'courses/normal-course'
+    naucse_render.compile_many(
+        {slug: tmp_path / str(slug) for slug in slugs},
+        path=str(path), jobs=jobs,
+    )
+    for slug in slugs:
+        assert_dirs_same(
+            tmp_path / str(slug),
+            fixture_path / 'expected-compiled' / (slug or 'default'),
+        )
+    if jobs == 1:
+        # Lessons shared by several courses are only rendered once
+        assert len(render_log) == len(set(render_log))
+        assert ('homework/tasks', 'index') in render_log
+
+
+def test_compile_many_bad_link(tmp_path):
+    """If a course fails, courses that weren't written are cleaned up"""
+    path = tmp_path / 'content'
+    shutil.copytree(fixture_path / 'test_content', path)
+    with open(path / 'lessons/homework/tasks/index.md', 'a') as f:
+        print('<a href="{{ static("bad.png") }}">Bad link</a>', file=f)
+    destinations = {
+        'courses/extra-lessons': tmp_path / 'extra-lessons',
+        'lessons': tmp_path / 'lessons',
+    }
+    with pytest.raises(ValueError, match='missing static file bad.png'):
+        naucse_render.compile_many(destinations, path=path)
+    for destination in destinations.values():
+        assert not destination.exists()
+
+
+def test_compile_many_failure_keeps_previous_output(tmp_path):
+    """If a lesson fails to render, no previous output is removed"""
+    path = tmp_path / 'content'
+    shutil.copytree(fixture_path / 'test_content', path)
+    destinations = {
+        'courses/normal-course': tmp_path / 'normal-course',
+        'lessons': tmp_path / 'lessons',
+    }
+    naucse_render.compile_many(destinations, path=path)
+    before = {
+        slug: sorted(
+            (p, p.read_bytes()) for p in dest.glob('**/*') if p.is_file()
+        )
+        for slug, dest in destinations.items()
+    }
+
+    # Break a lesson used only by the 'lessons' course
+    with open(path / 'lessons/homework/tasks/index.md', 'a') as f:
+        print('{{ undefined_variable.attribute }}', file=f)
+    with pytest.raises(Exception):
+        naucse_render.compile_many(destinations, path=path)
+    for slug, dest in destinations.items():
+        assert sorted(
+            (p, p.read_bytes()) for p in dest.glob('**/*') if p.is_file()
+        ) == before[slug]
+
+
+def test_get_lessons_parallel():
+    path = fixture_path / 'test_content'
+    slugs = [
+        'beginners/install-editor', 'homework/tasks', 'nonexistent/lesson',
+        'testcases/test_subpages',
+    ]
+    serial = naucse_render.get_lessons(slugs, path=str(path))
+    parallel = naucse_render.get_lessons(slugs, path=str(path), jobs=2)
+    assert parallel == serial
+    assert list(parallel['data']) == [
+        'beginners/install-editor', 'homework/tasks', 'testcases/test_subpages',
+    ]
+
+
 @pytest.mark.parametrize(
     'slug',
     [
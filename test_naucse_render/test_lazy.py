@@ -0,0 +1,50 @@
+import pytest
+
+import naucse_render
+
+from test_naucse_render.conftest import fixture_path
+
+
+PATH = fixture_path / 'test_content'
+
+
+def test_lazy_page(render_log):
+    lesson = naucse_render.LazyLesson('beginners/install-editor', path=PATH)
+    assert lesson.title == 'Instalace editoru'
+    assert set(lesson.pages) == {'index', 'atom', 'gedit'}
+    page = lesson.pages['gedit']
+    assert page.title == 'Nastavení Geditu'
+    assert render_log == []
+
+    content = page.content
+    assert 'gedit' in content
+    assert page.ids
+    assert render_log == [('beginners/install-editor', 'gedit')]
+
+    # Rendered once
+    assert page.content is content
+    page.links, page.solutions, page.dependencies
+    assert render_log == [('beginners/install-editor', 'gedit')]
+
+
+@pytest.mark.parametrize('slug', (
+    'beginners/install-editor', 'homework/tasks', 'testcases/test_subpages',
+))
+def test_lazy_lesson_same_as_get_lessons(slug):
+    lesson = naucse_render.LazyLesson(slug, {'user-gender': 'f'}, path=PATH)
+    expected = naucse_render.get_lessons(
+        [slug], {'user-gender': 'f'}, path=PATH,
+    )
+    assert lesson.to_dict() == expected['data'][slug]
+
+
+def test_lazy_lesson_nonexistent():
+    lesson = naucse_render.LazyLesson('nonexistent/lesson', path=PATH)
+    with pytest.raises(FileNotFoundError):
+        lesson.pages
+
+
+def test_get_course_does_not_render(render_log):
+    naucse_render.get_course('lessons', path=PATH)
+    naucse_render.get_course('courses/extra-lessons', path=PATH)
+    assert render_log == []
@@ -1,7 +1,10 @@
 import pytest
 import yaml
 
-from naucse_render.load import read_yaml, _read_yaml
+from naucse_render.load import read_yaml, yaml_cache, YamlCache
+from naucse_render.load import YamlLoader, PyYamlLoader
+
+from test_naucse_render.conftest import fixture_path
 
 
 def test_read_yaml(tmp_path):
@@ -23,18 +26,17 @@ def test_read_yaml_uses_cache(tmp_path):
         - 3
     """)
 
-    # We assert that cache is used by looking at lru_cache information from
-    # the internal function.
-    start_info = _read_yaml.cache_info()
+    # We assert that cache is used by looking at the cache's counters.
+    start_info = yaml_cache.info()
 
     first = read_yaml(tmp_path, 'test.yaml')
 
-    info = _read_yaml.cache_info()
+    info = yaml_cache.info()
     assert info.hits == start_info.hits
     assert info.misses == start_info.misses + 1
 
     second = read_yaml(tmp_path, 'test.yaml')
-    info = _read_yaml.cache_info()
+    info = yaml_cache.info()
     assert info.hits == start_info.hits + 1
     assert info.misses == start_info.misses + 1
 
@@ -54,6 +56,51 @@ def test_read_yaml_break_cache(tmp_path):
     assert read_yaml(tmp_path, 'test.yaml') == {'changed': 1}
 
 
+def test_yaml_cache_replaces_stale_entry(tmp_path):
+    """A changed file replaces its old entry rather than adding a new one"""
+    cache = YamlCache()
+    yaml_path = tmp_path / 'test.yaml'
+    yaml_path.write_text('a: 1')
+    assert cache.get(yaml_path) == {'a': 1}
+    yaml_path.write_text('a: 22')
+    assert cache.get(yaml_path) == {'a': 22}
+    assert cache.get(yaml_path) == {'a': 22}
+    assert cache.info() == (1, 2, 0, 1, 1024)
+
+
+def test_yaml_cache_bounded(tmp_path):
+    cache = YamlCache(maxsize=2)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f'{i}.yaml'
+        path.write_text(f'value: {i}')
+        paths.append(path)
+        cache.get(path)
+    assert len(cache) == 2
+    assert cache.info().evictions == 1
+
+    # The least recently used entry was evicted
+    cache.get(paths[2])
+    cache.get(paths[1])
+    assert cache.info().misses == 3
+    cache.get(paths[0])
+    assert cache.info().misses == 4
+
+
+def test_yaml_cache_clear_and_invalidate(tmp_path):
+    cache = YamlCache()
+    yaml_path = tmp_path / 'test.yaml'
+    yaml_path.write_text('a: 1')
+    cache.get(yaml_path)
+    cache.invalidate(yaml_path)
+    assert len(cache) == 0
+    cache.get(yaml_path)
+    cache.clear()
+    assert len(cache) == 0
+    cache.get(yaml_path)
+    assert cache.info().misses == 3
+
+
 def test_read_yaml_disallow_parents(tmp_path):
     """Assert that read_yaml cache is invalidated when the file changes"""
     with pytest.raises(ValueError):
@@ -76,6 +123,36 @@ def test_isolated_load(tmp_path):
     assert data == {'data': {'a': 1, 'b': 2}}
 
 
+def test_read_yaml_frozen(tmp_path):
+    """Frozen data is shared with the cache and can't be modified"""
+    yaml_path = tmp_path / 'test.yaml'
+    yaml_path.write_text("""data:
+        a: [1, 2]
+    """)
+    data = read_yaml(tmp_path, 'test.yaml', frozen=True)
+    assert data == {'data': {'a': (1, 2)}}
+    assert read_yaml(tmp_path, 'test.yaml', frozen=True) is data
+    with pytest.raises(TypeError):
+        data['data']['b'] = 3
+    with pytest.raises(TypeError):
+        del data['data']
+
+    # Unfrozen data is still a fresh copy, using plain dicts and lists
+    data = read_yaml(tmp_path, 'test.yaml')
+    assert data == {'data': {'a': [1, 2]}}
+    assert type(data['data']) is dict
+    data['data']['a'].append(3)
+    assert read_yaml(tmp_path, 'test.yaml') == {'data': {'a': [1, 2]}}
+
+
+def test_read_yaml_frozen_source_key(tmp_path):
+    yaml_path = tmp_path / 'test.yaml'
+    yaml_path.write_text("a: 1")
+    data = read_yaml(tmp_path, 'test.yaml', source_key='src', frozen=True)
+    assert data == {'a': 1, 'src': 'test.yaml'}
+    assert read_yaml(tmp_path, 'test.yaml', frozen=True) == {'a': 1}
+
+
 def test_read_yaml_disallow_duplicate_keys(tmp_path):
     """Assert that read_yaml disallows duplicate keys"""
     yaml_path = tmp_path / 'test.yaml'
@@ -87,6 +164,29 @@ def test_read_yaml_disallow_duplicate_keys(tmp_path):
         read_yaml(tmp_path, 'test.yaml')
 
 
+@pytest.mark.parametrize('loader', (YamlLoader, PyYamlLoader))
+def test_loader_disallows_duplicate_keys(loader):
+    with pytest.raises(yaml.constructor.ConstructorError):
+        yaml.load('a: 1\na: 2', Loader=loader)
+
+
+@pytest.mark.parametrize(
+    'yaml_path',
+    sorted((fixture_path / 'test_content').glob('**/*.yml')),
+    ids=lambda p: str(p.relative_to(fixture_path)),
+)
+def test_loaders_agree(yaml_path):
+    """The libyaml-based and pure-Python loaders give the same results"""
+    text = yaml_path.read_text(encoding='utf-8')
+    try:
+        expected = yaml.load(text, Loader=PyYamlLoader)
+    except yaml.YAMLError as e:
+        with pytest.raises(type(e)):
+            yaml.load(text, Loader=YamlLoader)
+    else:
+        assert yaml.load(text, Loader=YamlLoader) == expected
+
+
 @pytest.mark.xfail(
     strict=True,
     reason="Incomplete workaround for https://github.com/yaml/pyyaml/issues/165"
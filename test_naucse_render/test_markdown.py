@@ -4,6 +4,7 @@ import html
 import pytest
 
 from naucse_render.markdown import convert_markdown, style_space_after_prompt
+from naucse_render.markdown import get_lexer_by_name, highlight_code
 
 
 def test_markdown_admonition():
@@ -190,6 +191,21 @@ def test_static_link_conversion(what):
     assert '{}="rab/oof"'.format(param) in convert_markdown(text, convert_url)
 
 
+def test_url_conversion_not_reused():
+    """Reused converters don't keep the URL conversion of a previous call"""
+    convert_markdown('[a](foo)', lambda url: 'converted')
+    assert 'href="foo"' in convert_markdown('[a](foo)')
+
+
+def test_nested_conversion():
+    """convert_url can itself convert Markdown"""
+    def convert_url(url):
+        return str(convert_markdown(url, lambda url: 'inner', inline=True))
+
+    result = convert_markdown('[a](foo) [b](bar)', convert_url)
+    assert result == '<p><a href="foo">a</a> <a href="bar">b</a></p>'
+
+
 @pytest.fixture(params=['$', '(__venv__)$', '>>>', '...'])
 def prompt(request):
     return request.param.replace('>', '&gt;')
@@ -303,3 +319,16 @@ def test_convert_full_dosvenv_prompt():
     """).strip()
     print(expected)
     assert convert_markdown(src) == expected
+
+
+def test_highlight_cached():
+    src = dedent("""
+        ```python
+        print('cached')
+        ```
+    """)
+    first = convert_markdown(src)
+    info = highlight_code.cache_info()
+    assert convert_markdown(src) == first
+    assert highlight_code.cache_info().hits == info.hits + 1
+    assert get_lexer_by_name('python') is get_lexer_by_name('python')
@@ -1,4 +1,5 @@
 from textwrap import dedent
+import json
 from pathlib import Path
 
 import click
@@ -6,7 +7,7 @@ import pygments
 
 import pytest
 
-from naucse_render.notebook import convert_notebook
+from naucse_render.notebook import convert_notebook, get_exporter
 
 
 FIXTURES = Path(__file__).parent / 'fixtures'
@@ -70,3 +71,25 @@ def test_notebook_has_highlighted_input_area(notebook):
 def test_notebook_has_desired_outputs(notebook, output):
     output_pre = '<pre>{}</pre>'.format(output)
     assert output_pre in notebook.replace('\n', '')
+
+
+def test_notebook_exporter_reused(_notebook):
+    """Converting other notebooks doesn't affect later conversions"""
+    path = FIXTURES / 'notebook.ipynb'
+    content = json.loads(path.read_text())
+    content['metadata']['language_info'] = {'name': 'ruby'}
+    ruby_notebook = convert_notebook(json.dumps(content))
+    assert 'hl-ruby' in ruby_notebook
+
+    convert_notebook(path.read_text(), lambda url: 'converted')
+    assert convert_notebook(path.read_text()) == _notebook
+    assert get_exporter() is get_exporter()
+
+
+def test_notebook_without_language_info(_notebook):
+    path = FIXTURES / 'notebook.ipynb'
+    content = json.loads(path.read_text())
+    del content['metadata']['language_info']
+    result = convert_notebook(json.dumps(content))
+    assert 'hl-ipython3' in result
+    assert result == _notebook
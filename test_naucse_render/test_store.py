@@ -0,0 +1,94 @@
+import json
+import shutil
+
+import naucse_render
+from naucse_render.store import ContentStore
+
+from test_naucse_render.conftest import fixture_path
+
+
+def iter_content_paths(course_info):
+    for lesson in course_info['course']['lessons'].values():
+        for page in lesson['pages'].values():
+            yield page['content']['path']
+        for static_file in lesson['static_files'].values():
+            yield static_file['path']
+
+
+def read_contents(destination):
+    """Return {item: content} for content referenced from course.json"""
+    info = json.loads((destination / 'course.json').read_text())
+    result = {}
+    for lesson_slug, lesson in info['course']['lessons'].items():
+        for page_slug, page in lesson['pages'].items():
+            path = destination / page['content']['path']
+            result[lesson_slug, page_slug] = path.read_bytes()
+        for filename, static_file in lesson['static_files'].items():
+            path = destination / static_file['path']
+            result[lesson_slug, filename] = path.read_bytes()
+    return result
+
+
+def test_store(tmp_path):
+    path = fixture_path / 'test_content'
+    store_dir = tmp_path / 'store'
+    slugs = 'courses/extra-lessons', 'lessons'
+    naucse_render.compile_many(
+        {slug: tmp_path / slug for slug in slugs},
+        path=path, store_dir=store_dir,
+    )
+    inodes = {}
+    for slug in slugs:
+        destination = tmp_path / slug
+        info = json.loads((destination / 'course.json').read_text())
+        for content_path in iter_content_paths(info):
+            assert content_path.startswith('_objects/')
+            stat = (destination / content_path).stat()
+            stored_stat = (store_dir / content_path[len('_objects/'):]).stat()
+            assert stat.st_ino == stored_stat.st_ino
+            inodes.setdefault(content_path, set()).add(stat.st_ino)
+
+        # Same content as without the store
+        naucse_render.compile(
+            slug, path=path, destination=tmp_path / 'plain' / slug,
+        )
+        assert read_contents(destination) == read_contents(
+            tmp_path / 'plain' / slug,
+        )
+
+    # Content shared by both courses is stored only once
+    assert any(
+        len(ino) == 1
+        for content_path, ino in inodes.items()
+        if content_path.endswith('.png')
+    )
+
+
+def test_store_unchanged_by_incremental_compile(tmp_path):
+    """Incremental compile without a store doesn't modify stored files"""
+    path = tmp_path / 'content'
+    shutil.copytree(fixture_path / 'test_content', path)
+    store_dir = tmp_path / 'store'
+    destination = tmp_path / 'out'
+    naucse_render.compile(
+        'lessons', path=path, destination=destination, store_dir=store_dir,
+    )
+    stored = {p: p.read_bytes() for p in store_dir.glob('**/*') if p.is_file()}
+    page_path = path / 'lessons/homework/tasks/index.md'
+    page_path.write_text(page_path.read_text() + '\nEXTRA TEXT\n')
+    naucse_render.compile(
+        'lessons', path=path, destination=destination, incremental=True,
+    )
+    assert 'EXTRA TEXT' in str(read_contents(destination))
+    assert {
+        p: p.read_bytes() for p in store_dir.glob('**/*') if p.is_file()
+    } == stored
+
+
+def test_add_bytes(tmp_path):
+    store = ContentStore(tmp_path)
+    name = store.add_bytes(b'content', '.html')
+    assert name.suffix == '.html'
+    assert (tmp_path / name).read_bytes() == b'content'
+    assert store.add_bytes(b'content', '.html') == name
+    assert store.add_bytes(b'other', '.html') != name
@@ -1,4 +1,7 @@
-from naucse_render.compile import unique_path
+import sys
+
+from naucse_render.compile import unique_path, NameRegistry
+from naucse_render.compile import is_case_insensitive, externalize_content
 
 def test_unique_path(tmp_path):
     path = tmp_path / 'file.ext'
@@ -9,3 +12,79 @@ def test_unique_path(tmp_path):
         path.write_text(str(i))
         path = unique_path(path)
         assert tmp_path in path.parents
+
+
+def test_name_registry_same_as_unique_path(tmp_path):
+    """NameRegistry gives the same names as probing the filesystem"""
+    names = [
+        'a/index.html', 'a/index.html', 'a/image.png', 'a/index.1.html',
+        'a/index.html', 'b/index.html', 'a/README', 'a/README', 'a/index.html',
+        'a/x.tar.gz', 'a/x.tar.gz',
+    ]
+    registry = NameRegistry()
+    for name in names:
+        expected = unique_path(tmp_path / name)
+        expected.parent.mkdir(exist_ok=True)
+        expected.write_text('')
+        assert registry.allocate(tmp_path / name) == expected
+
+
+def test_name_registry_taken(tmp_path):
+    registry = NameRegistry([tmp_path / 'f.txt', tmp_path / 'f.2.txt'])
+    assert registry.allocate(tmp_path / 'f.txt') == tmp_path / 'f.1.txt'
+    assert registry.allocate(tmp_path / 'f.txt') == tmp_path / 'f.3.txt'
+    assert registry.allocate(tmp_path / 'g.txt') == tmp_path / 'g.txt'
+    assert tmp_path / 'f.3.txt' in registry
+    # The filesystem isn't touched
+    assert not any(tmp_path.iterdir())
+
+
+def test_name_registry_casefold(tmp_path):
+    registry = NameRegistry([tmp_path / 'a/Index.html'], casefold=True)
+    assert registry.allocate(tmp_path / 'a/index.html') == (
+        tmp_path / 'a/index.1.html'
+    )
+    assert registry.allocate(tmp_path / 'A/INDEX.html') == (
+        tmp_path / 'A/INDEX.2.html'
+    )
+    assert tmp_path / 'a/INDEX.1.HTML' in registry
+    assert tmp_path / 'b/index.html' not in registry
+
+
+def test_name_registry_case_sensitive(tmp_path):
+    registry = NameRegistry([tmp_path / 'a/Index.html'])
+    assert registry.allocate(tmp_path / 'a/index.html') == (
+        tmp_path / 'a/index.html'
+    )
+
+
+def test_is_case_insensitive(tmp_path):
+    (tmp_path / 'probe').write_text('')
+    expected = (tmp_path / 'PROBE').exists()
+    assert is_case_insensitive(tmp_path) == expected
+    # The temporary file is removed
+    assert [p.name for p in tmp_path.iterdir()] == ['probe']
+
+
+def test_externalizer_case_insensitive(tmp_path, monkeypatch):
+    """Pages whose names differ only in case get different files"""
+    # (`naucse_render.compile` is the function, not the module)
+    compile_module = sys.modules['naucse_render.compile']
+    monkeypatch.setattr(
+        compile_module, 'is_case_insensitive', lambda path: True,
+    )
+    course_info = {'lessons': {
+        'a/Lesson': {'pages': {'index': {'content': 'upper'}}},
+        'b/lesson': {'pages': {'index': {'content': 'lower'}}},
+    }}
+    externalize_content(course_info, tmp_path, tmp_path)
+    paths = {
+        slug: lesson['pages']['index']['content']['path']
+        for slug, lesson in course_info['lessons'].items()
+    }
+    assert paths == {
+        'a/Lesson': 'Lesson/index.html',
+        'b/lesson': 'lesson/index.1.html',
+    }
+    for slug, content in ('a/Lesson', 'upper'), ('b/lesson', 'lower'):
+        assert (tmp_path / paths[slug]).read_text() == content
@@ -0,0 +1,56 @@
+import json
+
+from naucse_render.watch import Watcher, watch
+from naucse_render.compile import compile
+from naucse_render.cache import MemoryRenderCache
+
+
+def test_watcher(content_path):
+    watcher = Watcher(content_path)
+    assert watcher.poll() == []
+
+    page_path = content_path / 'lessons/beginners/install-editor/index.md'
+    page_path.write_text(page_path.read_text() + '\nchanged\n')
+    new_path = content_path / 'lessons/beginners/install-editor/new.md'
+    new_path.write_text('new')
+    (content_path / 'README.md').write_text('not watched')
+    assert watcher.poll() == [page_path, new_path]
+    assert watcher.poll() == []
+
+    new_path.unlink()
+    assert watcher.poll() == [new_path]
+
+
+def test_recompile_renders_only_changed_page(content_path, tmp_path, render_log):
+    destination = tmp_path / 'out'
+    cache = MemoryRenderCache()
+    compile(
+        'lessons', path=content_path, destination=destination,
+        cache_dir=cache, incremental=True,
+    )
+    assert len(render_log) > 1
+    render_log.clear()
+
+    page_path = content_path / 'lessons/beginners/install-editor/atom.md'
+    page_path.write_text(
+        page_path.read_text().replace(' Atomu ', ' CHANGED TEXT ')
+    )
+    compile(
+        'lessons', path=content_path, destination=destination,
+        cache_dir=cache, incremental=True,
+    )
+    assert render_log == [('beginners/install-editor', 'atom')]
+
+    info = json.loads((destination / 'course.json').read_text())
+    lesson = info['course']['lessons']['beginners/install-editor']
+    content_path = destination / lesson['pages']['atom']['content']['path']
+    assert 'CHANGED TEXT' in content_path.read_text()
+
+
+def test_watch(content_path, tmp_path):
+    destination = tmp_path / 'out'
+    watch(
+        'lessons', path=content_path, destination=destination,
+        max_compiles=1,
+    )
+    assert (destination / 'course.json').exists()